@@ -0,0 +1,214 @@
+import argparse
+import random
+import time
+from typing import Optional
+
+from game_engine import BoardGeometry, get_geometry
+from game_evaluator import get_batch_evaluator, has_numpy
+from game_search import SearchPosition
+from game_utils import RolloutPolicy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class BatchStats:
+    def __init__(self, size: tuple[int, int], policies: list[RolloutPolicy]):
+        self.size: tuple[int, int] = size
+        self.policies: list[RolloutPolicy] = policies
+        self.games: int = 0
+        self.wins: list[int] = [0] * len(policies)
+        self.ties: int = 0
+        self.total_scores: list[int] = [0] * len(policies)
+        # Games the randomly chosen first player won outright or tied
+        self.first_player_wins: int = 0
+        self.first_player_ties: int = 0
+        self.duration: float = 0.0
+
+    def win_rate(self, player: int) -> float:
+        return self.wins[player] / self.games if self.games > 0 else 0.0
+
+    def average_score(self, player: int) -> float:
+        return self.total_scores[player] / self.games if self.games > 0 else 0.0
+
+    @property
+    def first_player_win_rate(self) -> float:
+        return self.first_player_wins / self.games if self.games > 0 else 0.0
+
+    def add_game(self, scores: list[int], first_player: int):
+        self.games += 1
+        best_score = max(scores)
+        winners = [i for i, s in enumerate(scores) if s == best_score]
+        if len(winners) == 1:
+            self.wins[winners[0]] += 1
+        else:
+            self.ties += 1
+        if winners == [first_player]:
+            self.first_player_wins += 1
+        elif first_player in winners:
+            self.first_player_ties += 1
+        for i, score in enumerate(scores):
+            self.total_scores[i] += score
+
+    def add_batch(self, scores, first_players):
+        # scores (games, players) and first_players (games,) as numpy arrays
+        games = len(first_players)
+        best = scores == scores.max(axis=1, keepdims=True)
+        single = best.sum(axis=1) == 1
+        first_best = best[np.arange(games), first_players]
+        self.games += games
+        self.ties += int(games - single.sum())
+        for i in range(len(self.policies)):
+            self.wins[i] += int((single & best[:, i]).sum())
+            self.total_scores[i] += int(scores[:, i].sum())
+        self.first_player_wins += int((first_best & single).sum())
+        self.first_player_ties += int((first_best & ~single).sum())
+
+    def merge(self, other: 'BatchStats'):
+        self.games += other.games
+        self.ties += other.ties
+        self.first_player_wins += other.first_player_wins
+        self.first_player_ties += other.first_player_ties
+        self.duration += other.duration
+        for i in range(len(self.policies)):
+            self.wins[i] += other.wins[i]
+            self.total_scores[i] += other.total_scores[i]
+
+    def to_dict(self) -> dict:
+        return {
+            "size": list(self.size),
+            "policies": [p.value for p in self.policies],
+            "games": self.games,
+            "wins": self.wins,
+            "ties": self.ties,
+            "average_scores": [self.average_score(i) for i in range(len(self.policies))],
+            "first_player_win_rate": self.first_player_win_rate,
+            "first_player_ties": self.first_player_ties,
+            "duration": self.duration,
+        }
+
+    def __repr__(self) -> str:
+        players = ", ".join([f"{i} {p.value}: win rate {self.win_rate(i):.3f} score {self.average_score(i):.2f}"
+                             for i, p in enumerate(self.policies)])
+        return f"BatchStats({self.size[0]}x{self.size[1]} {self.games} games, {players}, ties {self.ties}, " \
+               f"first player win rate {self.first_player_win_rate:.3f} in {self.duration:.2f}s)"
+
+
+class BatchSimulator:
+    # Turn based games advance in lockstep, one row of the arrays per game. Every game draws one
+    # edge per step, so all of them end together after edge_count steps. Completing a box gives
+    # the mover another turn, as in TurnBasedBoard.draw_line.
+    def __init__(self, size: tuple[int, int], policies: list[RolloutPolicy], seed: Optional[int] = None):
+        if len(policies) < 2:
+            raise ValueError("Player amount should greater than 1!")
+        self.size: tuple[int, int] = size
+        self.geometry: BoardGeometry = get_geometry(size[0], size[1])
+        self.policies: list[RolloutPolicy] = policies
+        self.seed: Optional[int] = seed
+        self._rng: random.Random = random.Random(seed)
+        self._np_rng = None if np is None else np.random.default_rng(seed)
+
+    def simulate(self, games: int):
+        # Returns scores (games, players), first players (games,) and the drawn edges (games, steps)
+        geometry, rng = self.geometry, self._np_rng
+        evaluator = get_batch_evaluator(self.size[0], self.size[1])
+        player_count = len(self.policies)
+        rows = np.arange(games)
+        drawn = np.zeros((games, geometry.edge_count), dtype=bool)
+        # A spare last column takes the missing box of border edges, so no row updates a box twice
+        box_sides = np.zeros((games, geometry.box_count + 1), dtype=np.uint8)
+        edge_boxes = np.where(evaluator.edge_box_valid, evaluator.edge_boxes, geometry.box_count)
+        scores = np.zeros((games, player_count), dtype=np.int32)
+        first_players = rng.integers(0, player_count, games)
+        current = first_players.copy()
+        moves = np.empty((games, geometry.edge_count), dtype=np.int32)
+        # Random players walk a shuffled edge order and skip edges other players drew meanwhile,
+        # which picks uniformly among the undrawn ones without drawing fresh noise every step
+        permutations = np.argsort(rng.random((games, geometry.edge_count)), axis=1)
+        pointers = np.zeros(games, dtype=np.intp)
+        for step in range(geometry.edge_count):
+            edges = np.empty(games, dtype=np.intp)
+            for player, policy in enumerate(self.policies):
+                selected = np.flatnonzero(current == player)
+                if len(selected) == 0:
+                    continue
+                if policy == RolloutPolicy.RANDOM:
+                    pointer = pointers[selected]
+                    selected_edges = permutations[selected, pointer]
+                    stale = np.flatnonzero(drawn[selected, selected_edges])
+                    while len(stale) > 0:
+                        pointer[stale] += 1
+                        selected_edges[stale] = permutations[selected[stale], pointer[stale]]
+                        stale = stale[drawn[selected[stale], selected_edges[stale]]]
+                    pointers[selected] = pointer + 1
+                    edges[selected] = selected_edges
+                elif policy == RolloutPolicy.HEURISTIC:
+                    edges[selected] = evaluator.choose_batch(box_sides[selected, :-1], drawn[selected], rng)
+                else:
+                    raise SystemError(f"Unhandled rollout policy {policy}!")
+            drawn[rows, edges] = True
+            moves[:, step] = edges
+            boxes = edge_boxes[edges]
+            box_sides[rows[:, None], boxes] += evaluator.edge_box_valid[edges]
+            completed = (box_sides[rows[:, None], boxes] == 4).sum(axis=1)
+            scores[rows, current] += completed
+            current = np.where(completed > 0, current, (current + 1) % player_count)
+        return scores, first_players, moves
+
+    def _simulate_game(self) -> tuple[list[int], int]:
+        # Pure Python path when numpy isn't installed
+        rng = self._rng
+        position = SearchPosition(self.geometry)
+        scores = [0] * len(self.policies)
+        first_player = rng.randrange(len(self.policies))
+        current = first_player
+        while position.remaining > 0:
+            policy = self.policies[current]
+            if policy == RolloutPolicy.RANDOM:
+                edge = position.available.sample(rng)
+            elif policy == RolloutPolicy.HEURISTIC:
+                edge_scores = [(position.move_score(e), e) for e in position.available]
+                best_score = max(edge_scores)[0]
+                edge = rng.choice([e for s, e in edge_scores if s == best_score])
+            else:
+                raise SystemError(f"Unhandled rollout policy {policy}!")
+            completed = position.make(edge)
+            if completed > 0:
+                scores[current] += completed
+            else:
+                current = (current + 1) % len(scores)
+        return scores, first_player
+
+    def run(self, games: int, batch_size: int = 4096) -> BatchStats:
+        stats = BatchStats(self.size, self.policies)
+        start_time = time.perf_counter()
+        if has_numpy():
+            # Batches bound the memory of the (games, edges) arrays
+            for start in range(0, games, batch_size):
+                scores, first_players, _ = self.simulate(min(batch_size, games - start))
+                stats.add_batch(scores, first_players)
+        else:
+            for _ in range(games):
+                stats.add_game(*self._simulate_game())
+        stats.duration = time.perf_counter() - start_time
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many Dox games at once")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("columns", type=int)
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--policies", nargs="+", default=[RolloutPolicy.HEURISTIC.value, RolloutPolicy.RANDOM.value],
+                        choices=[p.value for p in RolloutPolicy], help="One policy per player")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    simulator = BatchSimulator((args.rows, args.columns), [RolloutPolicy(p) for p in args.policies], args.seed)
+    print(simulator.run(args.games, args.batch_size))
+
+
+if __name__ == '__main__':
+    main()
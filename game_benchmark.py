@@ -0,0 +1,198 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Optional
+
+from game_core import Board, TurnBasedBoard, SimultaneousBoard
+from game_players import RandomComputerPlayer, SmartComputerPlayer
+from game_ui import print_board
+from game_utils import Line, EngineType
+
+DEFAULT_SIZES = [(4, 4), (10, 10), (30, 30), (100, 100)]
+_BOARD_TYPES: list[type[Board]] = [TurnBasedBoard, SimultaneousBoard]
+
+
+class BenchmarkResult:
+    def __init__(self, name: str, board_name: str, size: tuple[int, int], engine_type: EngineType, value: float, unit: str, samples: int):
+        self.name: str = name
+        self.board_name: str = board_name
+        self.size: tuple[int, int] = size
+        self.engine_type: EngineType = engine_type
+        self.value: float = value
+        self.unit: str = unit
+        self.samples: int = samples
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}/{self.board_name}/{self.size[0]}x{self.size[1]}/{self.engine_type.value}"
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "name": self.name,
+            "board": self.board_name,
+            "size": list(self.size),
+            "engine": self.engine_type.value,
+            "value": self.value,
+            "unit": self.unit,
+            "samples": self.samples,
+        }
+
+    def __repr__(self) -> str:
+        return f"{self.key:<60} {self.value * 1e6:>14.2f} us/{self.unit}"
+
+
+def _time_per_call(func: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings)
+
+
+def _create_board(board_type: type[Board], size: tuple[int, int], engine_type: EngineType, seed: int) -> Board:
+    return board_type(size, [SmartComputerPlayer("A"), RandomComputerPlayer("B")], engine_type, seed)
+
+
+def _draw(board: Board, line: Line):
+    if isinstance(board, TurnBasedBoard):
+        board.draw_line(line)
+    else:
+        board.draw_line_players({line: [board.players[0]]})
+
+
+def _half_filled_board(board_type: type[Board], size: tuple[int, int], engine_type: EngineType, seed: int) -> Board:
+    board = _create_board(board_type, size, engine_type, seed)
+    lines = board.get_available_lines()
+    board.rng.shuffle(lines)
+    for line in lines[:len(lines) // 2]:
+        _draw(board, line)
+    return board
+
+
+def bench_draw_line(board_type: type[Board], size: tuple[int, int], engine_type: EngineType, repeat: int) -> float:
+    timings = []
+    for i in range(max(1, repeat // 10)):
+        board = _create_board(board_type, size, engine_type, i)
+        lines = board.get_available_lines()
+        board.rng.shuffle(lines)
+        start_time = time.perf_counter()
+        for line in lines:
+            _draw(board, line)
+        timings.append((time.perf_counter() - start_time) / len(lines))
+    return statistics.median(timings)
+
+
+def bench_is_game_finish(board_type: type[Board], size: tuple[int, int], engine_type: EngineType, repeat: int) -> float:
+    board = _half_filled_board(board_type, size, engine_type, 0)
+    return _time_per_call(board.is_game_finish, repeat)
+
+
+def bench_available_lines(board_type: type[Board], size: tuple[int, int], engine_type: EngineType, repeat: int) -> float:
+    board = _half_filled_board(board_type, size, engine_type, 0)
+    # noinspection PyProtectedMember
+    return _time_per_call(board.players[0]._get_available_lines, repeat)
+
+
+def bench_smart_in_turn(board_type: type[Board], size: tuple[int, int], engine_type: EngineType, repeat: int) -> float:
+    board = _half_filled_board(board_type, size, engine_type, 0)
+    return _time_per_call(board.players[0].in_turn, max(1, repeat // 10))
+
+
+def bench_print_board(board_type: type[Board], size: tuple[int, int], engine_type: EngineType, repeat: int) -> float:
+    board = _half_filled_board(board_type, size, engine_type, 0)
+    output = io.StringIO()
+
+    def render():
+        with contextlib.redirect_stdout(output):
+            print_board(board)
+        output.seek(0)
+        output.truncate()
+
+    return _time_per_call(render, max(1, repeat // 10))
+
+
+BENCHMARKS: dict[str, tuple[Callable[[type[Board], tuple[int, int], EngineType, int], float], str]] = {
+    "draw_line": (bench_draw_line, "line"),
+    "is_game_finish": (bench_is_game_finish, "call"),
+    "available_lines": (bench_available_lines, "call"),
+    "smart_in_turn": (bench_smart_in_turn, "move"),
+    "print_board": (bench_print_board, "frame"),
+}
+
+
+def run_benchmarks(sizes: list[tuple[int, int]], engine_type: EngineType = EngineType.BITBOARD, repeat: int = 50,
+                   names: Optional[list[str]] = None) -> list[BenchmarkResult]:
+    results = []
+    for name in names if names is not None else list(BENCHMARKS.keys()):
+        func, unit = BENCHMARKS[name]
+        for board_type in _BOARD_TYPES:
+            for size in sizes:
+                value = func(board_type, size, engine_type, repeat)
+                result = BenchmarkResult(name, board_type.__name__, size, engine_type, value, unit, repeat)
+                print(result)
+                results.append(result)
+    return results
+
+
+def write_results(results: list[BenchmarkResult], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": [r.to_dict() for r in results],
+        }, f, indent=2)
+
+
+def compare_results(results: list[BenchmarkResult], baseline_path: str, threshold: float) -> list[str]:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["key"]: r["value"] for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        base_value = baseline.get(result.key)
+        if base_value is not None and base_value > 0 and result.value > base_value * (1 + threshold):
+            regressions.append(f"{result.key}: {base_value * 1e6:.2f} -> {result.value * 1e6:.2f} us/{result.unit} "
+                               f"(+{(result.value / base_value - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _parse_size(content: str) -> tuple[int, int]:
+    rows, columns = content.lower().split("x")
+    return int(rows), int(columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dox game benchmarks")
+    parser.add_argument("--sizes", default=",".join([f"{r}x{c}" for r, c in DEFAULT_SIZES]), help="Board sizes, e.g. '4x4,10x10'")
+    parser.add_argument("--engine", default=EngineType.BITBOARD.value, choices=[e.value for e in EngineType])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--only", default=None, help="Comma separated benchmark names")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", default=None, help="Result file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown ratio before flagging a regression")
+    args = parser.parse_args()
+    results = run_benchmarks(
+        sizes=[_parse_size(s) for s in args.sizes.split(",")],
+        engine_type=EngineType(args.engine),
+        repeat=args.repeat,
+        names=args.only.split(",") if args.only else None
+    )
+    write_results(results, args.output)
+    if args.baseline is not None:
+        regressions = compare_results(results, args.baseline, args.threshold)
+        if len(regressions) > 0:
+            print("\nRegressions:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print("\nNo regression")
+
+
+if __name__ == '__main__':
+    main()
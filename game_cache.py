@@ -0,0 +1,218 @@
+import functools
+import hashlib
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import BinaryIO, Optional
+
+from game_engine import get_geometry
+from game_symmetry import BoardSymmetry, get_symmetry
+
+_MAGIC = b"DOXC"
+_VERSION = 1
+# magic, version, size bits, rows, columns
+_HEADER = struct.Struct("<4sBBHH6x")
+_SLOT_WORDS = 2
+_WORD_SIZE = 8
+_VALUE_OFFSET = 1 << 15
+_VALID_BIT = 1 << 42
+# Moves are stored plus one in 16 bits
+_MAX_EDGES = 0xFFFF
+
+
+def position_cache_file_name(size: tuple[int, int]) -> str:
+    return f"{size[0]}x{size[1]}.dxc"
+
+
+def _pack_entry(depth: int, value: int, flag: int, move: int) -> int:
+    return (move + 1) | (value + _VALUE_OFFSET) << 16 | depth << 32 | flag << 40 | _VALID_BIT
+
+
+def _unpack_entry(data: int) -> tuple[int, int, int, int]:
+    return data >> 32 & 0xFF, (data >> 16 & 0xFFFF) - _VALUE_OFFSET, data >> 40 & 0x3, (data & 0xFFFF) - 1
+
+
+def _check_size(size: tuple[int, int]):
+    if get_geometry(size[0], size[1]).edge_count > _MAX_EDGES:
+        raise ValueError(f"Position cache supports at most {_MAX_EDGES} edges, {size[0]}x{size[1]} board is too large!")
+
+
+class SharedPositionTable:
+    # Direct mapped slots of (key ^ data, data) words. A slot torn by two processes writing
+    # at once fails the xor check and reads as a miss, so workers share it without locks
+    def __init__(self, buffer, size: tuple[int, int], size_bits: int, create: bool):
+        _check_size(size)
+        self.size: tuple[int, int] = size
+        self.size_bits: int = size_bits
+        self._file: Optional[BinaryIO] = None
+        self._map: Optional[mmap.mmap] = None
+        self._memory: Optional[SharedMemory] = None
+        if create:
+            _HEADER.pack_into(buffer, 0, _MAGIC, _VERSION, size_bits, size[0], size[1])
+        else:
+            magic, version, stored_bits, rows, cols = _HEADER.unpack_from(buffer, 0)
+            if magic != _MAGIC or version != _VERSION or (rows, cols) != size or stored_bits != size_bits:
+                raise ValueError(f"Position cache doesn't match {size[0]}x{size[1]} board!")
+        self._mask: int = (1 << size_bits) - 1
+        self._view: memoryview = memoryview(buffer)
+        self._words: memoryview = self._view[_HEADER.size:self.byte_size(size_bits)].cast("Q")
+
+    @staticmethod
+    def byte_size(size_bits: int) -> int:
+        return _HEADER.size + (_SLOT_WORDS * _WORD_SIZE << size_bits)
+
+    @staticmethod
+    def open_file(path: str, size: tuple[int, int], size_bits: int = 18) -> 'SharedPositionTable':
+        # Every process maps the same file, so the page cache is the shared memory
+        _check_size(size)
+        if not os.path.exists(path):
+            # Publish a complete header at once, a racing process keeps whichever file won
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, _VERSION, size_bits, size[0], size[1]))
+                f.truncate(SharedPositionTable.byte_size(size_bits))
+            try:
+                os.link(temp_path, path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(temp_path)
+        file = open(path, "r+b")
+        try:
+            header = file.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise ValueError(f"{path} isn't a position cache!")
+            size_bits = _HEADER.unpack(header)[2]
+            file_map = mmap.mmap(file.fileno(), SharedPositionTable.byte_size(size_bits))
+            table = SharedPositionTable(file_map, size, size_bits, False)
+        except (ValueError, OSError):
+            file.close()
+            raise
+        table._file, table._map = file, file_map
+        return table
+
+    @staticmethod
+    def create_shared(size: tuple[int, int], size_bits: int = 18, name: Optional[str] = None) -> 'SharedPositionTable':
+        _check_size(size)
+        memory = SharedMemory(name, create=True, size=SharedPositionTable.byte_size(size_bits))
+        table = SharedPositionTable(memory.buf, size, size_bits, True)
+        table._memory = memory
+        return table
+
+    @staticmethod
+    def attach_shared(name: str, size: tuple[int, int]) -> 'SharedPositionTable':
+        memory = SharedMemory(name)
+        # Only the creator unlinks the block, workers attaching to it must not
+        # noinspection PyProtectedMember
+        resource_tracker.unregister(memory._name, "shared_memory")
+        size_bits = _HEADER.unpack_from(memory.buf, 0)[2]
+        table = SharedPositionTable(memory.buf, size, size_bits, False)
+        table._memory = memory
+        return table
+
+    @property
+    def name(self) -> Optional[str]:
+        return None if self._memory is None else self._memory.name
+
+    def get(self, key: int) -> Optional[tuple[int, int, int, int]]:
+        index = (key & self._mask) * _SLOT_WORDS
+        data = self._words[index + 1]
+        if data != 0 and self._words[index] ^ data == key:
+            return _unpack_entry(data)
+        return None
+
+    def put(self, key: int, depth: int, value: int, flag: int, move: int):
+        index = (key & self._mask) * _SLOT_WORDS
+        stored = self._words[index + 1]
+        if stored == 0 or self._words[index] ^ stored != key or _unpack_entry(stored)[0] <= depth:
+            data = _pack_entry(depth, value, flag, move)
+            self._words[index] = key ^ data
+            self._words[index + 1] = data
+
+    def close(self):
+        self._words.release()
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+        if self._memory is not None:
+            self._memory.close()
+
+    def unlink(self):
+        if self._memory is not None:
+            self._memory.unlink()
+
+
+class PositionCache:
+    # Positions equal under a reflection or rotation share one entry. Keys are a hash
+    # of the canonical edge mask, moves are stored in the canonical orientation.
+    def __init__(self, symmetry: BoardSymmetry, capacity: int = 1 << 16, backing: Optional[SharedPositionTable] = None):
+        self.symmetry: BoardSymmetry = symmetry
+        self.capacity: int = capacity
+        self.backing: Optional[SharedPositionTable] = backing
+        self.hits: int = 0
+        self.misses: int = 0
+        self._mask_bytes: int = (symmetry.geometry.edge_count + 7) // 8
+        self._entries: OrderedDict[int, tuple[int, int, int, int]] = OrderedDict()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def position_key(self, mask: int) -> tuple[int, int]:
+        canonical, index = self.symmetry.canonical_index(mask)
+        digest = hashlib.blake2b(canonical.to_bytes(self._mask_bytes, "little"), digest_size=8).digest()
+        return int.from_bytes(digest, "little"), index
+
+    def get(self, position_key: tuple[int, int]) -> Optional[tuple[int, int, int, int]]:
+        key, index = position_key
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.backing is not None:
+            entry = self.backing.get(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        depth, value, flag, move = entry
+        return depth, value, flag, self.symmetry.inverses[index][move] if move >= 0 else move
+
+    def put(self, position_key: tuple[int, int], depth: int, value: int, flag: int, move: int):
+        key, index = position_key
+        entry = (depth, value, flag, self.symmetry.permutations[index][move] if move >= 0 else move)
+        stored = self._entries.get(key)
+        if stored is None or stored[0] <= depth:
+            self._remember(key, entry)
+        if self.backing is not None:
+            self.backing.put(key, *entry)
+
+    def _remember(self, key: int, entry: tuple[int, int, int, int]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def close(self):
+        if self.backing is not None:
+            self.backing.close()
+
+
+@functools.lru_cache(maxsize=32)
+def open_position_cache(directory: str, max_row: int, max_col: int, size_bits: int = 18) -> PositionCache:
+    # Players in one process share a cache per board size, processes share the file
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, position_cache_file_name((max_row, max_col)))
+    backing = SharedPositionTable.open_file(path, (max_row, max_col), size_bits)
+    return PositionCache(get_symmetry(max_row, max_col), backing=backing)
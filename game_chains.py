@@ -0,0 +1,185 @@
+from typing import Optional
+
+from game_core import Board, BoardListener, Player
+from game_utils import Box
+
+_GROUND = -1
+
+
+class Chain:
+    # Boxes with exactly two drawn sides, linked through their undrawn edges
+    def __init__(self, boxes: list[int], is_loop: bool):
+        self.boxes: list[int] = boxes
+        self.is_loop: bool = is_loop
+
+    @property
+    def length(self) -> int:
+        return len(self.boxes)
+
+    @property
+    def is_long(self) -> bool:
+        return self.length >= 4 if self.is_loop else self.length >= 3
+
+    def __repr__(self) -> str:
+        return f"{'Loop' if self.is_loop else 'Chain'}({self.length})"
+
+
+class ChainAnalyzer(BoardListener):
+    def __init__(self, board: Board):
+        self.board: Board = board
+        self._chain_of: dict[int, Chain] = {}
+        self._dirty_boxes: set[int] = set(range(board.geometry.box_count))
+        board.add_listener(self)
+
+    def close(self):
+        self.board.remove_listener(self)
+
+    def on_line_added(self, board: Board, edge: int, players: list[Player], new_boxes: dict[Box, list[Player]]):
+        for box in board.geometry.edge_boxes[edge]:
+            self._invalidate(box)
+
+    def on_line_removed(self, board: Board, edge: int, players: list[Player], removed_boxes: list[Box]):
+        # A box losing a side may join the chains of its neighbours
+        for box in board.geometry.edge_boxes[edge]:
+            self._invalidate(box)
+            for box_edge in board.geometry.box_edges[box]:
+                neighbor = self._neighbor(box, box_edge)
+                if neighbor != _GROUND:
+                    self._invalidate(neighbor)
+
+    def on_reset(self, board: Board):
+        self._chain_of = {}
+        self._dirty_boxes = set(range(board.geometry.box_count))
+
+    def _invalidate(self, box: int):
+        chain = self._chain_of.get(box)
+        if chain is not None:
+            for chain_box in chain.boxes:
+                del self._chain_of[chain_box]
+            self._dirty_boxes.update(chain.boxes)
+        self._dirty_boxes.add(box)
+
+    def _undrawn_edges(self, box: int) -> list[int]:
+        return [e for e in self.board.geometry.box_edges[box] if not self.board.has_edge(e)]
+
+    def _neighbor(self, box: int, edge: int) -> int:
+        for other in self.board.geometry.edge_boxes[edge]:
+            if other != box:
+                return other
+        return _GROUND
+
+    def _is_chain_box(self, box: int) -> bool:
+        return box != _GROUND and self.board.get_box_sides_by_id(box) == 2
+
+    def _walk(self, start: int, edge: int, visited: set[int]) -> tuple[list[int], bool]:
+        path = []
+        box = self._neighbor(start, edge)
+        while self._is_chain_box(box) and box not in visited:
+            visited.add(box)
+            path.append(box)
+            edge = next(e for e in self._undrawn_edges(box) if e != edge)
+            box = self._neighbor(box, edge)
+        return path, box == start
+
+    def _build_chain(self, start: int) -> Chain:
+        visited = {start}
+        first_edge, second_edge = self._undrawn_edges(start)
+        forward, is_loop = self._walk(start, first_edge, visited)
+        if is_loop:
+            return Chain([start] + forward, True)
+        backward, _ = self._walk(start, second_edge, visited)
+        return Chain(list(reversed(backward)) + [start] + forward, False)
+
+    def _refresh(self):
+        for box in self._dirty_boxes:
+            if box not in self._chain_of and self._is_chain_box(box):
+                chain = self._build_chain(box)
+                for chain_box in chain.boxes:
+                    old_chain = self._chain_of.get(chain_box)
+                    if old_chain is not None:
+                        for old_box in old_chain.boxes:
+                            self._chain_of.pop(old_box, None)
+                for chain_box in chain.boxes:
+                    self._chain_of[chain_box] = chain
+        self._dirty_boxes = set()
+
+    def chains(self) -> list[Chain]:
+        self._refresh()
+        return list({id(c): c for c in self._chain_of.values()}.values())
+
+    def chain_of(self, box: int) -> Optional[Chain]:
+        self._refresh()
+        return self._chain_of.get(box)
+
+    def is_safe_edge(self, edge: int) -> bool:
+        return all([self.board.get_box_sides_by_id(b) < 2 for b in self.board.geometry.edge_boxes[edge]])
+
+    def is_endgame(self) -> bool:
+        return not any([self.is_safe_edge(e) for e in self.board.get_available_edges()])
+
+    def _capture_run(self, box: int) -> tuple[list[int], list[int], bool]:
+        # Boxes taken one after another from a capturable box, the undrawn edges
+        # between them, and whether the run ends at another capturable box
+        boxes, edges = [box], []
+        edge = self._undrawn_edges(box)[0]
+        current = self._neighbor(box, edge)
+        while current != _GROUND:
+            sides = self.board.get_box_sides_by_id(current)
+            if sides == 3:
+                edges.append(edge)
+                boxes.append(current)
+                return boxes, edges, True
+            elif sides != 2 or current in boxes:
+                break
+            edges.append(edge)
+            boxes.append(current)
+            edge = next(e for e in self._undrawn_edges(current) if e != edge)
+            current = self._neighbor(current, edge)
+        edges.append(edge)
+        return boxes, edges, False
+
+    def _has_other_long_chain(self, boxes: list[int]) -> bool:
+        excluded = set(boxes)
+        return any([c.is_long for c in self.chains() if excluded.isdisjoint(c.boxes)])
+
+    def _select_capture(self, capturable: list[int], endgame: bool) -> int:
+        runs, seen = [], set()
+        for box in capturable:
+            if box in seen:
+                continue
+            boxes, edges, closed = self._capture_run(box)
+            if not (closed and len(boxes) == 4) and not (not closed and len(boxes) == 2):
+                return edges[0]
+            runs.append((boxes, edges))
+            seen.update(boxes)
+        # Every run ends in a two-box handout: take all of them but the last one, then decline
+        # that one (all-but-two) while the opponent still has to open another long chain or loop
+        boxes, edges = runs[0]
+        if len(runs) == 1 and endgame and self._has_other_long_chain(boxes):
+            return edges[1]
+        return edges[0]
+
+    def _sacrifice_cost(self, edge: int) -> tuple[int, int]:
+        chains = {}
+        for box in self.board.geometry.edge_boxes[edge]:
+            if self.board.get_box_sides_by_id(box) >= 2:
+                chain = self.chain_of(box)
+                chains[id(chain)] = chain
+        cost = sum([c.length if c is not None else 1 for c in chains.values()])
+        # Opening a two-box chain in the middle denies the opponent a double-dealing reply
+        hard_hearted = len(chains) == 1 and len(self.board.geometry.edge_boxes[edge]) == 2 and \
+            all([self.board.get_box_sides_by_id(b) == 2 for b in self.board.geometry.edge_boxes[edge]])
+        return cost, 0 if hard_hearted else 1
+
+    def select_endgame_move(self) -> Optional[int]:
+        available_edges = self.board.get_available_edges()
+        if len(available_edges) == 0:
+            return None
+        endgame = self.is_endgame()
+        capturable = [b for b in range(self.board.geometry.box_count) if self.board.get_box_sides_by_id(b) == 3]
+        if len(capturable) > 0:
+            return self._select_capture(capturable, endgame)
+        elif not endgame:
+            return None
+        else:
+            return min(available_edges, key=self._sacrifice_cost)
@@ -1,27 +1,101 @@
 import abc
 import math
 import random
-from typing import Union, Optional
+from array import array
+from typing import Iterable, Iterator, Mapping, Union, Optional
 
-from game_utils import Line, Point, Box
+from game_engine import BoardEngine, EdgePool, NibbleArray, PackedEdgePool, create_engine, get_geometry
+from game_utils import Line, Point, Box, EngineType
+
+
+class BoardListener:
+    def on_line_added(self, board: 'Board', edge: int, players: list['Player'], new_boxes: dict[Box, list['Player']]):
+        pass
+
+    def on_line_removed(self, board: 'Board', edge: int, players: list['Player'], removed_boxes: list[Box]):
+        pass
+
+    def on_reset(self, board: 'Board'):
+        pass
+
+
+def _mask_typecode(player_count: int) -> str:
+    for typecode in ("B", "H", "I", "Q"):
+        if player_count <= array(typecode).itemsize * 8:
+            return typecode
+    raise ValueError(f"Player amount should less than {array('Q').itemsize * 8 + 1}!")
+
+
+class BoxOwners(Mapping):
+    # Read only view of the completed boxes, backed by one player bit mask per box
+    def __init__(self, board: 'Board'):
+        self._board: Board = board
+
+    def __getitem__(self, box: Box) -> list['Player']:
+        owners = self._board.find_box_players(box.x, box.y)
+        if owners is None:
+            raise KeyError(box)
+        return owners[1]
+
+    def __contains__(self, box: object) -> bool:
+        return isinstance(box, Box) and self._board.find_box_players(box.x, box.y) is not None
+
+    def __iter__(self) -> Iterator[Box]:
+        # noinspection PyProtectedMember
+        owner_masks = self._board._box_owner_masks
+        return (self._board.geometry.box_of(b) for b in range(len(owner_masks)) if owner_masks[b] != 0)
+
+    def __len__(self) -> int:
+        # noinspection PyProtectedMember
+        return self._board._owned_box_count
 
 
 class Board:
-    def __init__(self, size: tuple[int, int], players: list['Player']):
+    def __init__(self, size: tuple[int, int], players: list['Player'], engine_type: EngineType = EngineType.LINE_SET,
+                 seed: Optional[int] = None):
         self._validate_size(size)
         self._validate_players(players)
         self.max_row = size[0]
         self.max_col = size[1]
+        self.seed: Optional[int] = seed
+        self.rng: random.Random = random.Random(seed)
+        self.geometry = get_geometry(self.max_row, self.max_col)
+        self._engine: BoardEngine = create_engine(engine_type, self.geometry)
+        # Huge boards pack edges and box sides into bits and nibbles, and keep no move history
+        self._keeps_history: bool = not self.geometry.is_huge
+        self._box_sides: Union[bytearray, NibbleArray] = self._new_box_sides()
+        self._available_edges: Union[EdgePool, PackedEdgePool] = \
+            EdgePool(self.geometry.edge_count) if self._keeps_history else PackedEdgePool(self.geometry.edge_count)
+        self._mask_typecode: str = _mask_typecode(len(players))
+        self._player_bits: dict[Player, int] = {p: 1 << i for i, p in enumerate(players)}
+        self._mask_players: dict[int, list[Player]] = {}
+        self._box_owner_masks: array = self._new_masks(self.geometry.box_count)
+        self._owned_box_count: int = 0
+        self._listeners: list[BoardListener] = []
+        self._reset_journal()
+        self.boxes: BoxOwners = BoxOwners(self)
         self.players: list[Player] = players
         for player in self.players:
             player.join_game(self)
-        self.lines: set[Line] = set()
-        self.boxes: dict[Box, list[Player]] = {}
 
     @property
     def board_name(self) -> str:
         return self.__class__.__name__
 
+    @property
+    def engine(self) -> BoardEngine:
+        return self._engine
+
+    @property
+    def lines(self) -> set[Line]:
+        return self._engine.lines
+
+    def add_listener(self, listener: BoardListener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: BoardListener):
+        self._listeners.remove(listener)
+
     @staticmethod
     def _validate_size(size: tuple[int, int]):
         if size[0] <= 3 or size[1] <= 3:
@@ -34,11 +108,49 @@ class Board:
         elif len(players) < 2:
             raise ValueError("Player amount should greater than 1!")
 
+    def _new_box_sides(self) -> Union[bytearray, NibbleArray]:
+        return bytearray(self.geometry.box_count) if self._keeps_history else NibbleArray(self.geometry.box_count)
+
+    def _new_masks(self, size: int = 0) -> array:
+        return array(self._mask_typecode, [0]) * size
+
+    def _players_mask(self, players: Iterable['Player']) -> int:
+        mask = 0
+        for player in players:
+            mask |= self._player_bits[player]
+        return mask
+
+    def _mask_to_players(self, mask: int) -> list['Player']:
+        players = self._mask_players.get(mask)
+        if players is None:
+            players = [p for p in self.players if mask & self._player_bits[p]]
+            self._mask_players[mask] = players
+        return players
+
+    def _reset_journal(self):
+        # One entry per drawn line: edge, its position in the edge pool, up to two completed boxes (-1 if none),
+        # the drawing players, the turn state before the move and the previous scores of the drawing players
+        self._journal_edges: array = array("i")
+        self._journal_positions: array = array("i")
+        self._journal_boxes: array = array("i")
+        self._journal_players: array = self._new_masks()
+        self._journal_turns: array = self._new_masks()
+        self._journal_scores: array = array("d")
+        self._redo_edges: array = array("i")
+        self._redo_players: array = self._new_masks()
+        self._redo_turns: array = self._new_masks()
+
     def reset(self):
-        self.lines = []
-        self.boxes = {}
+        self._engine.reset()
+        self._box_sides = self._new_box_sides()
+        self._available_edges.reset()
+        self._box_owner_masks = self._new_masks(self.geometry.box_count)
+        self._owned_box_count = 0
+        self._reset_journal()
         for player in self.players:
             player.reset()
+        for listener in self._listeners:
+            listener.on_reset(self)
 
     def get_winner(self) -> list['Player']:
         if self.is_game_finish():
@@ -48,31 +160,76 @@ class Board:
             raise SystemError("Game is running!")
 
     def check_line(self, line: Line) -> bool:
-        return line.in_range(0, 0, self.max_col - 1, self.max_row - 1) and \
-            abs((line.point_1.x + line.point_1.y) - (line.point_2.x + line.point_2.y)) == 1
+        return self.geometry.edge_of(line) >= 0
 
     def has_line(self, line: Line) -> bool:
-        return self.check_line(line) and line in self.lines
+        return self.check_line(line) and self._engine.has_line(line)
+
+    def has_edge(self, edge: int) -> bool:
+        return 0 <= edge < self.geometry.edge_count and edge not in self._available_edges
 
     def has_points_line(self, p1: Union[Point, tuple[int, int]], p2: Union[Point, tuple[int, int]]) -> bool:
         return self.has_line(Line(p1, p2))
 
+    def get_box_sides(self, box: Box) -> int:
+        if not box.in_range(0, 0, self.max_col - 2, self.max_row - 2):
+            raise ValueError(f"Invalid box {box}!")
+        return self._box_sides[self.geometry.box_id(box.x, box.y)]
+
+    def get_box_sides_by_id(self, box: int) -> int:
+        return self._box_sides[box]
+
+    def get_adjacent_box_sides(self, line: Line) -> list[int]:
+        edge = self.geometry.edge_of(line)
+        if edge < 0:
+            raise ValueError(f"Invalid line {line}!")
+        return [self._box_sides[b] for b in self.geometry.edge_boxes[edge]]
+
+    @property
+    def available_line_count(self) -> int:
+        return len(self._available_edges)
+
+    def get_available_lines(self) -> list[Line]:
+        return [self.geometry.edge_line(e) for e in self._available_edges]
+
+    def get_available_edges(self) -> list[int]:
+        return list(self._available_edges)
+
+    def get_available_edges_view(self) -> memoryview:
+        return self._available_edges.view()
+
+    def get_box_sides_view(self) -> memoryview:
+        if isinstance(self._box_sides, NibbleArray):
+            return memoryview(self._box_sides.unpack())
+        return memoryview(self._box_sides)
+
+    def get_drawn_edges(self) -> list[int]:
+        return self._available_edges.removed()
+
+    def get_move_history(self) -> list[tuple[int, list['Player']]]:
+        # Drawn edges in order with the players who drew them
+        return [(e, self._mask_to_players(m)) for e, m in zip(self._journal_edges, self._journal_players)]
+
+    def get_random_available_line(self, rng: Optional[random.Random] = None) -> Line:
+        return self.geometry.edge_line(self._available_edges.sample(rng or self.rng))
+
     def has_box(self, box: Box) -> bool:
         return box.in_range(0, 0, self.max_col - 2, self.max_row - 2) and box in self.boxes
 
     def find_box_players(self, x: int, y: int) -> Optional[tuple[Box, list['Player']]]:
-        for box, players in self.boxes.items():
-            if box.x == x and box.y == y:
-                return box, players
+        if 0 <= x < self.max_row - 1 and 0 <= y < self.max_col - 1:
+            mask = self._box_owner_masks[self.geometry.box_id(x, y)]
+            if mask != 0:
+                return Box(x, y), self._mask_to_players(mask)
         return None
 
     def is_game_finish(self) -> bool:
         all_lines = (self.max_row - 1) * self.max_col + (self.max_col - 1) * self.max_row
         all_boxes = (self.max_col - 1) * (self.max_row - 1)
-        has_all_lines = len(self.lines) == all_lines
+        has_all_lines = self._engine.line_count == all_lines
         has_all_boxes = len(self.boxes) == all_boxes
         if has_all_lines != has_all_boxes:
-            raise SystemError(f"Game lines and boxes status error! Lines: {len(self.lines)}/{all_lines} Boxes: {len(self.boxes)}/{all_boxes}")
+            raise SystemError(f"Game lines and boxes status error! Lines: {self._engine.line_count}/{all_lines} Boxes: {len(self.boxes)}/{all_boxes}")
         return has_all_lines and has_all_boxes
 
     @staticmethod
@@ -86,43 +243,115 @@ class Board:
         return opposite_lines
 
     def _make_available_new_boxes(self, line: Line) -> list[Box]:
-        opposite_lines = self.generate_opposite_lines(line)
-        result = []
-        for opposite_line in opposite_lines:
-            if self.has_line(opposite_line):
-                side_lines = [line.link_point_1(opposite_line), line.link_point_2(opposite_line)]
-                if all([self.has_line(i) for i in side_lines]):
-                    result.append(Box.from_lines([line, opposite_line] + side_lines))
-        return result
+        edge = self.geometry.edge_of(line)
+        if edge < 0:
+            raise ValueError(f"Invalid line {line}!")
+        return [self.geometry.box_of(b) for b in self.geometry.edge_boxes[edge] if self._box_sides[b] == 3]
 
     def can_make_boxes(self, line: Line) -> bool:
         return len(self._make_available_new_boxes(line)) > 0
 
-    def _generate_new_boxes(self, line: Line, players: list['Player']) -> dict[Box, list['Player']]:
-        new_boxes = self._make_available_new_boxes(line)
-        if len(new_boxes) == 0:
-            return {}
-        return dict(zip(new_boxes, [players] * len(new_boxes)))
-
     def _add_new_line_players(self, line: Line, players: list['Player']) -> dict[Box, list['Player']]:
-        if line in self.lines:
-            raise ValueError(f"Line {line} already exists!")
-        elif not self.check_line(line):
+        edge = self.geometry.edge_of(line)
+        if edge < 0:
             raise ValueError(f"Invalid line {line}!")
+        elif edge not in self._available_edges:
+            raise ValueError(f"Line {line} already exists!")
         else:
-            new_boxes = self._generate_new_boxes(line, players)
-            self.boxes.update(new_boxes)
-            self.lines.add(line)
+            edge_boxes = self.geometry.edge_boxes[edge]
+            box_ids = [b for b in edge_boxes if self._box_sides[b] == 3]
+            new_boxes = {self.geometry.box_of(b): players for b in box_ids}
+            players_mask = self._players_mask(players)
+            if self._keeps_history:
+                self._journal_edges.append(edge)
+                self._journal_positions.append(self._available_edges.position(edge))
+                self._journal_boxes.extend(box_ids + [-1] * (2 - len(box_ids)))
+                self._journal_players.append(players_mask)
+                self._journal_turns.append(self._get_turn_state())
+                self._journal_scores.extend([p.score for p in self._mask_to_players(players_mask)])
+                if len(self._redo_edges) > 0:
+                    self._redo_edges, self._redo_players, self._redo_turns = array("i"), self._new_masks(), self._new_masks()
+            for box_id in box_ids:
+                self._box_owner_masks[box_id] = players_mask
+            self._owned_box_count += len(box_ids)
+            self._engine.add_line(line)
+            self._available_edges.remove(edge)
+            for box in edge_boxes:
+                self._box_sides[box] += 1
             for player in players:
                 player.add_score(len(new_boxes) / len(players))
-                player.add_moves(line)
+                if self._keeps_history:
+                    player.add_move_edge(edge)
+            for listener in self._listeners:
+                listener.on_line_added(self, edge, players, new_boxes)
             return new_boxes
 
+    def _get_turn_state(self) -> int:
+        return 0
+
+    def _set_turn_state(self, state: int):
+        pass
+
+    @property
+    def can_undo(self) -> bool:
+        return len(self._journal_edges) > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return len(self._redo_edges) > 0
+
+    def undo(self) -> Line:
+        if not self._keeps_history:
+            raise ValueError("Huge boards don't keep an undo history!")
+        elif len(self._journal_edges) == 0:
+            raise ValueError("No move to undo!")
+        edge = self._journal_edges.pop()
+        position = self._journal_positions.pop()
+        box_ids = [self._journal_boxes.pop(), self._journal_boxes.pop()]
+        players_mask = self._journal_players.pop()
+        turn_state = self._journal_turns.pop()
+        players = self._mask_to_players(players_mask)
+        scores = [self._journal_scores.pop() for _ in players]
+        self._redo_edges.append(edge)
+        self._redo_players.append(players_mask)
+        self._redo_turns.append(self._get_turn_state())
+        line = self.geometry.edge_line(edge)
+        removed_boxes = []
+        for box_id in box_ids:
+            if box_id >= 0:
+                self._box_owner_masks[box_id] = 0
+                self._owned_box_count -= 1
+                removed_boxes.append(self.geometry.box_of(box_id))
+        self._engine.remove_line(line)
+        self._available_edges.restore(edge, position)
+        for box in self.geometry.edge_boxes[edge]:
+            self._box_sides[box] -= 1
+        for player, score in zip(reversed(players), scores):
+            player.remove_last_move(score)
+        self._set_turn_state(turn_state)
+        for listener in self._listeners:
+            listener.on_line_removed(self, edge, players, removed_boxes)
+        return line
+
+    def redo(self) -> Line:
+        if len(self._redo_edges) == 0:
+            raise ValueError("No move to redo!")
+        edge = self._redo_edges.pop()
+        players = self._mask_to_players(self._redo_players.pop())
+        turn_state = self._redo_turns.pop()
+        redo_journal = (self._redo_edges, self._redo_players, self._redo_turns)
+        line = self.geometry.edge_line(edge)
+        self._add_new_line_players(line, players)
+        self._redo_edges, self._redo_players, self._redo_turns = redo_journal
+        self._set_turn_state(turn_state)
+        return line
+
 
 class TurnBasedBoard(Board):
-    def __init__(self, size: tuple[int, int], players: list['Player']):
-        super().__init__(size, players)
-        self._current_player_index: int = random.randint(0, len(self.players) - 1)
+    def __init__(self, size: tuple[int, int], players: list['Player'], engine_type: EngineType = EngineType.LINE_SET,
+                 seed: Optional[int] = None):
+        super().__init__(size, players, engine_type, seed)
+        self._current_player_index: int = self.rng.randint(0, len(self.players) - 1)
 
     def get_current_player(self) -> 'Player':
         if 0 <= self._current_player_index < len(self.players):
@@ -130,6 +359,15 @@ class TurnBasedBoard(Board):
         else:
             raise ValueError(f"Wrong player index {self._current_player_index} in {len(self.players)}!")
 
+    def set_current_player(self, player: 'Player'):
+        self._current_player_index = self.players.index(player)
+
+    def _get_turn_state(self) -> int:
+        return self._current_player_index
+
+    def _set_turn_state(self, state: int):
+        self._current_player_index = state
+
     def _next_turn(self) -> 'Player':
         if 0 <= self._current_player_index < len(self.players):
             if self._current_player_index == len(self.players) - 1:
@@ -147,8 +385,9 @@ class TurnBasedBoard(Board):
 
 
 class SimultaneousBoard(Board):
-    def __init__(self, size: tuple[int, int], players: list['Player']):
-        super().__init__(size, players)
+    def __init__(self, size: tuple[int, int], players: list['Player'], engine_type: EngineType = EngineType.LINE_SET,
+                 seed: Optional[int] = None):
+        super().__init__(size, players, engine_type, seed)
         self._continue_players: set[Player] = set()
 
     def get_current_players(self):
@@ -157,6 +396,9 @@ class SimultaneousBoard(Board):
         else:
             return self._continue_players
 
+    def set_continue_players(self, players: Iterable['Player']):
+        self._continue_players = set(players)
+
     def check_conflict_lines(self, line_players: dict[Line, list['Player']]) -> list[Line]:
         conflict_lines = []
         for line, players in line_players.items():
@@ -164,18 +406,25 @@ class SimultaneousBoard(Board):
                 conflict_lines.append(line)
         return conflict_lines
 
+    def _get_turn_state(self) -> int:
+        return self._players_mask(self._continue_players)
+
+    def _set_turn_state(self, state: int):
+        self._continue_players = set(self._mask_to_players(state))
+
     def draw_line_players(self, line_players: dict[Line, list['Player']]):
-        self._continue_players.clear()
+        continue_players = set()
         for line, players in line_players.items():
             if len(self._add_new_line_players(line, players)) > 0:
-                self._continue_players.update(players)
+                continue_players.update(players)
+        self._continue_players = continue_players
 
 
 class Player(abc.ABC):
     def __init__(self, name: str):
         self._name: str = name
         self._score: float = 0.0
-        self.moves: list[Line] = []
+        self._move_edges: array = array("i")
         self._board: Optional[Board] = None
 
     def join_game(self, board: Board):
@@ -201,9 +450,15 @@ class Player(abc.ABC):
             raise SystemError(f"{self} didn't join any game!")
         return self._score
 
+    @property
+    def moves(self) -> list[Line]:
+        if self._board is None:
+            return []
+        return [self._board.geometry.edge_line(e) for e in self._move_edges]
+
     def reset(self):
         self._score = 0
-        self.moves = []
+        self._move_edges = array("i")
 
     def add_score(self, step: float = 1.0):
         if self._board is None:
@@ -213,7 +468,18 @@ class Player(abc.ABC):
     def add_moves(self, line: Line):
         if self._board is None:
             raise SystemError(f"{self} didn't join any game!")
-        self.moves.append(line)
+        self._move_edges.append(self._board.geometry.edge_of(line))
+
+    def add_move_edge(self, edge: int):
+        if self._board is None:
+            raise SystemError(f"{self} didn't join any game!")
+        self._move_edges.append(edge)
+
+    def remove_last_move(self, previous_score: float):
+        if self._board is None:
+            raise SystemError(f"{self} didn't join any game!")
+        self._move_edges.pop()
+        self._score = previous_score
 
     @abc.abstractmethod
     def in_turn(self) -> Line:
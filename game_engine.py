@@ -0,0 +1,476 @@
+import abc
+import functools
+import random
+from array import array
+from typing import Callable, Iterable, Iterator, Sequence
+
+from game_utils import Line, Box, EngineType
+
+# Boards with more edges than this compute their lookup tables on demand instead of storing them
+HUGE_BOARD_EDGES = 1 << 16
+
+
+class _LazyTable(Sequence):
+    def __init__(self, size: int, make: Callable[[int], object]):
+        self._size: int = size
+        self._make: Callable[[int], object] = make
+
+    def __getitem__(self, index: int):
+        if not 0 <= index < self._size:
+            raise IndexError(f"Index {index} out of range!")
+        return self._make(index)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class BoardGeometry:
+    # Horizontal edges (x,y)~(x,y+1) come first, then vertical edges (x,y)~(x+1,y)
+    def __init__(self, max_row: int, max_col: int):
+        self.max_row: int = max_row
+        self.max_col: int = max_col
+        self.horizontal_count: int = max_row * (max_col - 1)
+        self.vertical_count: int = (max_row - 1) * max_col
+        self.edge_count: int = self.horizontal_count + self.vertical_count
+        self.box_count: int = (max_row - 1) * (max_col - 1)
+        if self.is_huge:
+            self.box_edges: Sequence[tuple[int, int, int, int]] = _LazyTable(self.box_count, self._make_box_edges)
+            self.box_masks: Sequence[int] = _LazyTable(self.box_count, self._make_box_mask)
+            self.edge_boxes: Sequence[tuple[int, ...]] = _LazyTable(self.edge_count, self._make_edge_boxes)
+        else:
+            self.box_edges: Sequence[tuple[int, int, int, int]] = [self._make_box_edges(b) for b in range(self.box_count)]
+            self.box_masks: Sequence[int] = [sum(1 << e for e in edges) for edges in self.box_edges]
+            self.edge_boxes: Sequence[tuple[int, ...]] = [self._make_edge_boxes(e) for e in range(self.edge_count)]
+
+    @property
+    def is_huge(self) -> bool:
+        return self.edge_count > HUGE_BOARD_EDGES
+
+    def horizontal_edge(self, x: int, y: int) -> int:
+        return x * (self.max_col - 1) + y
+
+    def vertical_edge(self, x: int, y: int) -> int:
+        return self.horizontal_count + x * self.max_col + y
+
+    def box_id(self, x: int, y: int) -> int:
+        return x * (self.max_col - 1) + y
+
+    def is_horizontal_edge(self, edge: int) -> bool:
+        return edge < self.horizontal_count
+
+    def edge_of(self, line: Line) -> int:
+        p1, p2 = line.point_1, line.point_2
+        if p1.x == p2.x and p2.y == p1.y + 1:
+            if 0 <= p1.x < self.max_row and 0 <= p1.y < self.max_col - 1:
+                return self.horizontal_edge(p1.x, p1.y)
+        elif p1.y == p2.y and p2.x == p1.x + 1:
+            if 0 <= p1.x < self.max_row - 1 and 0 <= p1.y < self.max_col:
+                return self.vertical_edge(p1.x, p1.y)
+        return -1
+
+    def edge_points(self, edge: int) -> tuple[int, int, int, int]:
+        if edge < self.horizontal_count:
+            x, y = divmod(edge, self.max_col - 1)
+            return x, y, x, y + 1
+        else:
+            x, y = divmod(edge - self.horizontal_count, self.max_col)
+            return x, y, x + 1, y
+
+    def edge_line(self, edge: int) -> Line:
+        x1, y1, x2, y2 = self.edge_points(edge)
+        return Line.of(x1, y1, x2, y2)
+
+    def box_position(self, box: int) -> tuple[int, int]:
+        return divmod(box, self.max_col - 1)
+
+    def box_of(self, box: int) -> Box:
+        x, y = self.box_position(box)
+        return Box(x, y)
+
+    def _make_box_edges(self, box: int) -> tuple[int, int, int, int]:
+        x, y = self.box_position(box)
+        return self.horizontal_edge(x, y), self.horizontal_edge(x + 1, y), self.vertical_edge(x, y), self.vertical_edge(x, y + 1)
+
+    def _make_box_mask(self, box: int) -> int:
+        return sum(1 << e for e in self._make_box_edges(box))
+
+    def _make_edge_boxes(self, edge: int) -> tuple[int, ...]:
+        x, y, _, _ = self.edge_points(edge)
+        if self.is_horizontal_edge(edge):
+            candidates = [(x - 1, y), (x, y)]
+        else:
+            candidates = [(x, y - 1), (x, y)]
+        return tuple(self.box_id(bx, by) for bx, by in candidates if 0 <= bx < self.max_row - 1 and 0 <= by < self.max_col - 1)
+
+
+@functools.lru_cache(maxsize=32)
+def get_geometry(max_row: int, max_col: int) -> BoardGeometry:
+    return BoardGeometry(max_row, max_col)
+
+
+class EdgePool:
+    # Undrawn edges live in _edges[:_count], drawn ones are swapped behind them
+    def __init__(self, edge_count: int):
+        self._edge_count: int = edge_count
+        self._edges: array = array("i", range(edge_count))
+        self._positions: array = array("i", range(edge_count))
+        self._count: int = edge_count
+
+    def reset(self):
+        self._edges = array("i", range(self._edge_count))
+        self._positions = array("i", range(self._edge_count))
+        self._count = self._edge_count
+
+    def remove(self, edge: int):
+        position = self._positions[edge]
+        if position >= self._count:
+            raise ValueError(f"Edge {edge} isn't available!")
+        last_position = self._count - 1
+        last_edge = self._edges[last_position]
+        self._edges[position] = last_edge
+        self._positions[last_edge] = position
+        self._edges[last_position] = edge
+        self._positions[edge] = last_position
+        self._count = last_position
+
+    def restore(self, edge: int, position: int):
+        # Exact inverse of the latest remove(edge), which moved the edge from position
+        if self._positions[edge] != self._count:
+            raise ValueError(f"Edge {edge} isn't the latest removed one!")
+        moved_edge = self._edges[position]
+        self._edges[self._count] = moved_edge
+        self._positions[moved_edge] = self._count
+        self._edges[position] = edge
+        self._positions[edge] = position
+        self._count += 1
+
+    def position(self, edge: int) -> int:
+        return self._positions[edge]
+
+    def add(self, edge: int):
+        position = self._positions[edge]
+        if position < self._count:
+            raise ValueError(f"Edge {edge} is already available!")
+        first_position = self._count
+        first_edge = self._edges[first_position]
+        self._edges[position] = first_edge
+        self._positions[first_edge] = position
+        self._edges[first_position] = edge
+        self._positions[edge] = first_position
+        self._count = first_position + 1
+
+    def removed(self) -> list[int]:
+        return self._edges[self._count:].tolist()
+
+    def view(self) -> memoryview:
+        # Undrawn edges in pool order without copying, only valid until the pool changes
+        return memoryview(self._edges)[:self._count]
+
+    def sample(self, rng: random.Random) -> int:
+        if self._count == 0:
+            raise ValueError("No available edge!")
+        return self._edges[rng.randrange(self._count)]
+
+    def __contains__(self, edge: int) -> bool:
+        return 0 <= edge < self._edge_count and self._positions[edge] < self._count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._edges[:self._count])
+
+
+def _set_bits(data: bytes, limit: int) -> Iterator[int]:
+    for index, byte in enumerate(data):
+        while byte:
+            low_bit = byte & -byte
+            bit = index * 8 + low_bit.bit_length() - 1
+            if bit >= limit:
+                return
+            yield bit
+            byte ^= low_bit
+
+
+_INVERTED_BYTES = bytes(255 - i for i in range(256))
+_LOW_NIBBLES = bytes(i & 0xF for i in range(256))
+_HIGH_NIBBLES = bytes(i >> 4 for i in range(256))
+
+
+class PackedEdgePool:
+    # EdgePool of huge boards: one bit per undrawn edge. Positions aren't kept and edges are listed by
+    # scanning the bits. Sampling tries random edges first, once few are left it picks a random rank
+    # through the counts of every block of bits and of every group of blocks.
+    _BLOCK_BYTES = 64
+    _GROUP_BLOCKS = 64
+    _SAMPLE_TRIES = 16
+
+    def __init__(self, edge_count: int):
+        self._edge_count: int = edge_count
+        self.reset()
+
+    def reset(self):
+        self._bits: bytearray = bytearray(b"\xff") * ((self._edge_count + 7) // 8)
+        if self._edge_count & 7:
+            self._bits[-1] = (1 << (self._edge_count & 7)) - 1
+        self._count: int = self._edge_count
+        self._block_counts: array = array("H", [int.from_bytes(self._bits[i:i + self._BLOCK_BYTES], "little").bit_count()
+                                                for i in range(0, len(self._bits), self._BLOCK_BYTES)])
+        self._group_counts: array = array("I", [sum(self._block_counts[i:i + self._GROUP_BLOCKS])
+                                                for i in range(0, len(self._block_counts), self._GROUP_BLOCKS)])
+
+    def _count_edge(self, edge: int, step: int):
+        block = (edge >> 3) // self._BLOCK_BYTES
+        self._block_counts[block] += step
+        self._group_counts[block // self._GROUP_BLOCKS] += step
+        self._count += step
+
+    def remove(self, edge: int):
+        if edge not in self:
+            raise ValueError(f"Edge {edge} isn't available!")
+        self._bits[edge >> 3] ^= 1 << (edge & 7)
+        self._count_edge(edge, -1)
+
+    def restore(self, edge: int, position: int):
+        self.add(edge)
+
+    def position(self, edge: int) -> int:
+        return 0
+
+    def add(self, edge: int):
+        if edge in self:
+            raise ValueError(f"Edge {edge} is already available!")
+        self._bits[edge >> 3] |= 1 << (edge & 7)
+        self._count_edge(edge, 1)
+
+    def removed(self) -> list[int]:
+        return list(_set_bits(self._bits.translate(_INVERTED_BYTES), self._edge_count))
+
+    def view(self) -> memoryview:
+        # Built on every call, a huge board has no edge list to share
+        return memoryview(array("i", self))
+
+    def sample(self, rng: random.Random) -> int:
+        if self._count == 0:
+            raise ValueError("No available edge!")
+        for _ in range(self._SAMPLE_TRIES):
+            edge = rng.randrange(self._edge_count)
+            if edge in self:
+                return edge
+        rank = rng.randrange(self._count)
+        group = 0
+        while rank >= self._group_counts[group]:
+            rank -= self._group_counts[group]
+            group += 1
+        block = group * self._GROUP_BLOCKS
+        while rank >= self._block_counts[block]:
+            rank -= self._block_counts[block]
+            block += 1
+        start = block * self._BLOCK_BYTES
+        for edge in _set_bits(self._bits[start:start + self._BLOCK_BYTES], self._BLOCK_BYTES * 8):
+            if rank == 0:
+                return start * 8 + edge
+            rank -= 1
+        raise SystemError(f"Edge pool lost count of its {self._count} edges!")
+
+    def __contains__(self, edge: int) -> bool:
+        return 0 <= edge < self._edge_count and (self._bits[edge >> 3] >> (edge & 7)) & 1 == 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[int]:
+        return _set_bits(self._bits, self._edge_count)
+
+
+class NibbleArray:
+    # Counters from 0 to 15, two to a byte
+    def __init__(self, size: int):
+        self._size: int = size
+        self._data: bytearray = bytearray((size + 1) // 2)
+
+    def __getitem__(self, index: int) -> int:
+        byte = self._data[index >> 1]
+        return byte >> 4 if index & 1 else byte & 0xF
+
+    def __setitem__(self, index: int, value: int):
+        if not 0 <= value <= 0xF:
+            raise ValueError(f"Value {value} doesn't fit in a nibble!")
+        byte = self._data[index >> 1]
+        self._data[index >> 1] = byte & 0xF | value << 4 if index & 1 else byte & 0xF0 | value
+
+    def __len__(self) -> int:
+        return self._size
+
+    def unpack(self) -> bytearray:
+        result = bytearray(len(self._data) * 2)
+        result[0::2] = self._data.translate(_LOW_NIBBLES)
+        result[1::2] = self._data.translate(_HIGH_NIBBLES)
+        del result[self._size:]
+        return result
+
+
+class BoardEngine(abc.ABC):
+    def __init__(self, geometry: BoardGeometry):
+        self.geometry: BoardGeometry = geometry
+
+    @property
+    def engine_name(self) -> str:
+        return self.__class__.__name__
+
+    @abc.abstractmethod
+    def reset(self):
+        raise NotImplementedError
+
+    @property
+    @abc.abstractmethod
+    def line_count(self) -> int:
+        raise NotImplementedError
+
+    @property
+    @abc.abstractmethod
+    def lines(self) -> Iterable[Line]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def has_line(self, line: Line) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add_line(self, line: Line):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def remove_line(self, line: Line):
+        raise NotImplementedError
+
+
+class LineSetEngine(BoardEngine):
+    def __init__(self, geometry: BoardGeometry):
+        super().__init__(geometry)
+        self._lines: set[Line] = set()
+
+    def reset(self):
+        self._lines = set()
+
+    @property
+    def line_count(self) -> int:
+        return len(self._lines)
+
+    @property
+    def lines(self) -> set[Line]:
+        return self._lines
+
+    def has_line(self, line: Line) -> bool:
+        return line in self._lines
+
+    def add_line(self, line: Line):
+        self._lines.add(line)
+
+    def remove_line(self, line: Line):
+        self._lines.remove(line)
+
+
+class BitBoardEngine(BoardEngine):
+    def __init__(self, geometry: BoardGeometry):
+        super().__init__(geometry)
+        self.mask: int = 0
+        self._line_count: int = 0
+
+    def reset(self):
+        self.mask = 0
+        self._line_count = 0
+
+    @property
+    def line_count(self) -> int:
+        return self._line_count
+
+    @property
+    def lines(self) -> set[Line]:
+        return {self.geometry.edge_line(e) for e in self.edges()}
+
+    def edges(self) -> list[int]:
+        mask = self.mask
+        result = []
+        while mask:
+            low_bit = mask & -mask
+            result.append(low_bit.bit_length() - 1)
+            mask ^= low_bit
+        return result
+
+    def has_edge(self, edge: int) -> bool:
+        return (self.mask >> edge) & 1 == 1
+
+    def has_line(self, line: Line) -> bool:
+        edge = self.geometry.edge_of(line)
+        return edge >= 0 and (self.mask >> edge) & 1 == 1
+
+    def add_line(self, line: Line):
+        edge = self.geometry.edge_of(line)
+        if edge < 0:
+            raise ValueError(f"Invalid line {line}!")
+        self.mask |= 1 << edge
+        self._line_count += 1
+
+    def remove_line(self, line: Line):
+        edge = self.geometry.edge_of(line)
+        if edge < 0 or not self.has_edge(edge):
+            raise ValueError(f"Line {line} doesn't exist!")
+        self.mask ^= 1 << edge
+        self._line_count -= 1
+
+
+class PackedEngine(BoardEngine):
+    # One bit per edge in a fixed bytearray, so drawing a line never copies the whole board
+    def __init__(self, geometry: BoardGeometry):
+        super().__init__(geometry)
+        self._bits: bytearray = bytearray((geometry.edge_count + 7) // 8)
+        self._line_count: int = 0
+
+    def reset(self):
+        self._bits = bytearray((self.geometry.edge_count + 7) // 8)
+        self._line_count = 0
+
+    @property
+    def line_count(self) -> int:
+        return self._line_count
+
+    @property
+    def lines(self) -> set[Line]:
+        return {self.geometry.edge_line(e) for e in range(self.geometry.edge_count) if self.has_edge(e)}
+
+    def has_edge(self, edge: int) -> bool:
+        return (self._bits[edge >> 3] >> (edge & 7)) & 1 == 1
+
+    def has_line(self, line: Line) -> bool:
+        edge = self.geometry.edge_of(line)
+        return edge >= 0 and self.has_edge(edge)
+
+    def add_line(self, line: Line):
+        edge = self.geometry.edge_of(line)
+        if edge < 0:
+            raise ValueError(f"Invalid line {line}!")
+        self._bits[edge >> 3] |= 1 << (edge & 7)
+        self._line_count += 1
+
+    def remove_line(self, line: Line):
+        edge = self.geometry.edge_of(line)
+        if edge < 0 or not self.has_edge(edge):
+            raise ValueError(f"Line {line} doesn't exist!")
+        self._bits[edge >> 3] ^= 1 << (edge & 7)
+        self._line_count -= 1
+
+
+def default_engine_type(size: tuple[int, int]) -> EngineType:
+    return EngineType.PACKED if get_geometry(size[0], size[1]).is_huge else EngineType.LINE_SET
+
+
+def create_engine(engine_type: EngineType, geometry: BoardGeometry) -> BoardEngine:
+    if engine_type == EngineType.LINE_SET:
+        return LineSetEngine(geometry)
+    elif engine_type == EngineType.BITBOARD:
+        return BitBoardEngine(geometry)
+    elif engine_type == EngineType.PACKED:
+        return PackedEngine(geometry)
+    else:
+        raise SystemError(f"Unhandled engine type {engine_type}!")
@@ -0,0 +1,108 @@
+import functools
+import json
+from typing import Optional
+
+from game_core import Board
+from game_engine import BoardGeometry, get_geometry
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Score of drawing a side of a box which already has 0, 1, 2 or 3 sides
+DEFAULT_SIDE_WEIGHTS = (0, 1, -1, 3)
+# Boards with fewer available edges are faster to score in the Python loop
+MIN_VECTOR_EDGES = 48
+
+
+def has_numpy() -> bool:
+    return np is not None
+
+
+def check_side_weights(side_weights) -> tuple:
+    side_weights = tuple(side_weights)
+    if len(side_weights) != len(DEFAULT_SIDE_WEIGHTS):
+        raise ValueError(f"Expect {len(DEFAULT_SIDE_WEIGHTS)} side weights, got {len(side_weights)}!")
+    return side_weights
+
+
+def save_weight_profile(path: str, side_weights: tuple, **info):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"side_weights": list(check_side_weights(side_weights)), **info}, f, indent=2)
+
+
+def load_weight_profile(path: str) -> tuple:
+    with open(path, "r", encoding="utf-8") as f:
+        content = json.load(f)
+    if not isinstance(content, dict) or "side_weights" not in content:
+        raise ValueError(f"{path} isn't a weight profile!")
+    return check_side_weights(content["side_weights"])
+
+
+@functools.lru_cache(maxsize=64)
+def _side_scores(side_weights: tuple):
+    # A box can't have 4 sides before the edge is drawn, its entry only pads the masked lookups
+    return np.array(side_weights + (0,))
+
+
+class SmartEvaluator:
+    # SmartComputerPlayer's heuristic over whole boards at once. Every edge looks up its
+    # (at most two) boxes, edges on the border point their missing box at box 0 and mask it out.
+    def __init__(self, geometry: BoardGeometry):
+        if np is None:
+            raise SystemError("Vectorized evaluation requires numpy!")
+        self.geometry: BoardGeometry = geometry
+        self.edge_boxes, self.edge_box_valid = self._make_edge_boxes(geometry)
+
+    @staticmethod
+    def _make_edge_boxes(geometry: BoardGeometry):
+        rows, cols = geometry.max_row, geometry.max_col
+        # Horizontal edge (x, y) touches boxes (x - 1, y) and (x, y)
+        x, y = np.divmod(np.arange(geometry.horizontal_count, dtype=np.int64), cols - 1)
+        horizontal = np.stack([(x - 1) * (cols - 1) + y, x * (cols - 1) + y], axis=1)
+        horizontal_valid = np.stack([x > 0, x < rows - 1], axis=1)
+        # Vertical edge (x, y) touches boxes (x, y - 1) and (x, y)
+        x, y = np.divmod(np.arange(geometry.edge_count - geometry.horizontal_count, dtype=np.int64), cols)
+        vertical = np.stack([x * (cols - 1) + y - 1, x * (cols - 1) + y], axis=1)
+        vertical_valid = np.stack([y > 0, y < cols - 1], axis=1)
+        valid = np.concatenate([horizontal_valid, vertical_valid])
+        boxes = np.where(valid, np.concatenate([horizontal, vertical]), 0).astype(np.int32)
+        return boxes, valid
+
+    def score_edges(self, box_sides, edges, side_weights: tuple = DEFAULT_SIDE_WEIGHTS):
+        sides = box_sides[self.edge_boxes[edges]]
+        return (_side_scores(side_weights)[sides] * self.edge_box_valid[edges]).sum(axis=1)
+
+    def best_edges(self, board: Board, side_weights: tuple = DEFAULT_SIDE_WEIGHTS) -> list[int]:
+        # Ties keep the order of the board's available edges, the same order the Python loop sees
+        edges = np.frombuffer(board.get_available_edges_view(), dtype=np.int32)
+        box_sides = np.frombuffer(board.get_box_sides_view(), dtype=np.uint8)
+        scores = self.score_edges(box_sides, edges, side_weights)
+        return edges[scores == scores.max()].tolist()
+
+    def score_batch(self, box_sides, drawn, side_weights: tuple = DEFAULT_SIDE_WEIGHTS):
+        # box_sides (games, boxes) and drawn (games, edges) give the scores of every edge of every game,
+        # drawn edges score -inf
+        sides = box_sides[:, self.edge_boxes]
+        scores = (_side_scores(side_weights)[sides] * self.edge_box_valid).sum(axis=2, dtype=np.float64)
+        scores[drawn] = -np.inf
+        return scores
+
+    def choose_batch(self, box_sides, drawn, rng, side_weights: tuple = DEFAULT_SIDE_WEIGHTS) -> 'np.ndarray':
+        # Uniform among each game's best edges, games without any edge left get -1
+        scores = self.score_batch(box_sides, drawn, side_weights)
+        best = scores == scores.max(axis=1, keepdims=True)
+        choices = np.argmax(np.where(best, rng.random(scores.shape), -1.0), axis=1)
+        return np.where(drawn.all(axis=1), -1, choices)
+
+
+@functools.lru_cache(maxsize=32)
+def get_batch_evaluator(max_row: int, max_col: int) -> SmartEvaluator:
+    return SmartEvaluator(get_geometry(max_row, max_col))
+
+
+def get_smart_evaluator(board: Board) -> Optional[SmartEvaluator]:
+    if np is None or board.available_line_count < MIN_VECTOR_EDGES:
+        return None
+    return get_batch_evaluator(board.max_row, board.max_col)
@@ -1,42 +1,65 @@
-from game_core import Player, Board, TurnBasedBoard, SimultaneousBoard
-from game_players import HumanPlayer, SmartComputerPlayer, RandomComputerPlayer, is_computer_players
-from game_ui import print_divider, print_game_panel, print_winner, print_init_player, print_player_link, input_board_size, input_player_type, input_game_type
-from game_utils import Line, PlayerType, GameType
-
+from typing import Optional
 
-def play_game():
+from game_core import Player, Board, TurnBasedBoard, SimultaneousBoard
+from game_engine import default_engine_type
+from game_evaluator import DEFAULT_SIDE_WEIGHTS
+from game_players import HumanPlayer, SmartComputerPlayer, RandomComputerPlayer, TimedComputerPlayer, is_computer_players
+from game_record import GameRecorder
+from game_rounds import MoveCollector
+from game_ui import BoardRenderer, create_renderer, print_divider, print_winner, print_init_player, print_player_link, input_board_size, input_player_type, input_game_type
+from game_utils import Line, PlayerType, GameType, GameCommand, GameCommandRequest, TimeoutPolicy, RenderMode
+
+
+def play_game(record_path: Optional[str] = None, round_deadline: Optional[float] = None,
+              timeout_policy: TimeoutPolicy = TimeoutPolicy.RANDOM_MOVE, render_mode: RenderMode = RenderMode.FULL,
+              smart_weights: tuple = DEFAULT_SIDE_WEIGHTS, move_time: Optional[float] = 1.0,
+              game_time: Optional[float] = None, ponder: bool = True):
     print("Dox game\n")
-    board = _create_board()
-    _play_game_board(board)
-    _show_winner(board)
-
-
-def _play_game_board(board: Board):
+    board = _create_board(smart_weights, move_time, game_time, ponder)
+    recorder = None if record_path is None else GameRecorder(board, record_path, flush_every_move=True)
+    renderer = create_renderer(render_mode, board)
+    renderer.open(board)
+    try:
+        _play_game_board(board, renderer, round_deadline, timeout_policy)
+        _show_winner(board, renderer)
+    finally:
+        renderer.close()
+        if recorder is not None:
+            recorder.close()
+
+
+def _play_game_board(board: Board, renderer: BoardRenderer, round_deadline: Optional[float], timeout_policy: TimeoutPolicy):
     if isinstance(board, TurnBasedBoard):
-        _play_turn_based_game(board)
+        _play_turn_based_game(board, renderer)
     elif isinstance(board, SimultaneousBoard):
-        _play_simultaneous_game(board)
+        _play_simultaneous_game(board, renderer, round_deadline, timeout_policy)
     else:
         raise SystemError(f"Unhandled board {board.board_name}!")
 
 
-def _show_winner(board: Board):
+def _show_winner(board: Board, renderer: BoardRenderer):
     print_divider()
-    print_game_panel(board)
+    renderer.show_panel(board)
     print()
     print_winner(board.get_winner())
 
 
-def _play_turn_based_game(board: TurnBasedBoard):
+def _play_turn_based_game(board: TurnBasedBoard, renderer: BoardRenderer):
     print_divider()
     print_init_player(board.get_current_player())
     while not board.is_game_finish():
         print_divider()
         player = board.get_current_player()
         if isinstance(player, HumanPlayer):
-            print_game_panel(board)
+            renderer.show_panel(board)
             print()
-            _next_turn(board)
+            try:
+                _next_turn(board)
+            except GameCommandRequest as e:
+                if e.command == GameCommand.VIEW:
+                    renderer.center(*e.argument)
+                else:
+                    _run_command(board, e.command)
         else:
             new_line = _next_turn(board)
             print_player_link(player, new_line)
@@ -52,22 +75,57 @@ def _next_turn(board: TurnBasedBoard) -> Line:
             print(e)
 
 
-def _play_simultaneous_game(board: SimultaneousBoard):
-    while not board.is_game_finish():
-        players = board.get_current_players()
-        if not is_computer_players(*players):
-            print_divider()
-            print_game_panel(board)
-            print()
-        line_players = _get_all_line_players_in_turn(players)
-        conflict_lines = board.check_conflict_lines(line_players)
-        if len(conflict_lines) != 0:
-            print(f"Line {', '.join([str(i) for i in conflict_lines])} conflict!")
-        else:
-            board.draw_line_players(line_players)
+def _run_command(board: TurnBasedBoard, command: GameCommand):
+    # Computer moves are undone or redone together with the human move, so the human plays again
+    if command == GameCommand.UNDO:
+        step, can_step = board.undo, lambda: board.can_undo
+    elif command == GameCommand.REDO:
+        step, can_step = board.redo, lambda: board.can_redo
+    else:
+        raise SystemError(f"Unhandled command {command}!")
+    if not can_step():
+        print(f"Nothing to {command.value.lower()}!")
+        return
+    step()
+    while can_step() and not isinstance(board.get_current_player(), HumanPlayer):
+        step()
+
+
+def _play_simultaneous_game(board: SimultaneousBoard, renderer: BoardRenderer, round_deadline: Optional[float], timeout_policy: TimeoutPolicy):
+    collector = MoveCollector(_get_player_line_in_turn, round_deadline, timeout_policy)
+    try:
+        while not board.is_game_finish():
+            players = board.get_current_players()
+            human_players = [p for p in players if not is_computer_players(p)]
+            if len(human_players) > 0:
+                print_divider()
+                renderer.show_panel(board)
+                print()
+            try:
+                line_players = collector.collect(players, human_players)
+            except GameCommandRequest as e:
+                if e.command == GameCommand.VIEW:
+                    renderer.center(*e.argument)
+                else:
+                    print(f"Command {e.command.value} is only supported in turn based games!")
+                continue
+            for player in collector.timed_out:
+                print(f"{player} timed out!")
+            for line, line_owners in line_players.items():
+                for player in line_owners:
+                    if is_computer_players(player):
+                        print_divider()
+                        print_player_link(player, line)
+            conflict_lines = board.check_conflict_lines(line_players)
+            if len(conflict_lines) != 0:
+                print(f"Line {', '.join([str(i) for i in conflict_lines])} conflict!")
+            else:
+                board.draw_line_players(line_players)
+    finally:
+        collector.close()
 
 
-def _create_board() -> Board:
+def _create_board(smart_weights: tuple, move_time: Optional[float], game_time: Optional[float], ponder: bool) -> Board:
     while True:
         board_size = input_board_size()
         print()
@@ -80,32 +138,24 @@ def _create_board() -> Board:
             players = [HumanPlayer("A"), RandomComputerPlayer("B")]
             game_type = input_game_type()
         elif player_type == PlayerType.HUMAN_AND_SMART_COMPUTER:
-            players = [HumanPlayer("A"), SmartComputerPlayer("B")]
+            players = [HumanPlayer("A"), SmartComputerPlayer("B", smart_weights)]
+            game_type = input_game_type()
+        elif player_type == PlayerType.HUMAN_AND_SEARCH_COMPUTER:
+            players = [HumanPlayer("A"), TimedComputerPlayer("B", move_time, game_time, ponder)]
             game_type = input_game_type()
         else:
             raise SystemError(f"Unhandled player type {player_type}!")
         try:
             if game_type == GameType.TURN_BASED:
-                return TurnBasedBoard(board_size, players)
+                return TurnBasedBoard(board_size, players, default_engine_type(board_size))
             elif game_type == GameType.SIMULTANEOUS:
-                return SimultaneousBoard(board_size, players)
+                return SimultaneousBoard(board_size, players, default_engine_type(board_size))
             else:
                 raise SystemError(f"Unhandled game type {player_type}!")
         except ValueError as e:
             print(e)
 
 
-def _get_all_line_players_in_turn(players: list[Player]) -> dict[Line, list[Player]]:
-    line_players: dict[Line, list[Player]] = {}
-    for player in players:
-        new_line = _get_player_line_in_turn(player)
-        line_players.setdefault(new_line, []).append(player)
-        if is_computer_players(player):
-            print_divider()
-            print_player_link(player, new_line)
-    return line_players
-
-
 def _get_player_line_in_turn(player: Player) -> Line:
     while True:
         line = player.in_turn()
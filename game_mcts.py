@@ -0,0 +1,228 @@
+import atexit
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from game_engine import BoardGeometry, get_geometry
+from game_search import SearchPosition
+from game_utils import RolloutPolicy
+
+_executors: dict[int, ProcessPoolExecutor] = {}
+
+
+def get_rollout_executor(workers: int) -> ProcessPoolExecutor:
+    executor = _executors.get(workers)
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        _executors[workers] = executor
+    return executor
+
+
+@atexit.register
+def shutdown_rollout_executors():
+    while len(_executors) > 0:
+        _executors.popitem()[1].shutdown()
+
+
+def _choose_playout_edge(position: SearchPosition, rng: random.Random, policy: RolloutPolicy) -> int:
+    if policy == RolloutPolicy.RANDOM:
+        return position.available.sample(rng)
+    # Greedy playouts: capture when possible, otherwise draw an edge which gives no box its third side.
+    # The scan starts at a random edge, so equal candidates are drawn in random order.
+    edges, box_sides, edge_boxes = position.available.view(), position.box_sides, position.geometry.edge_boxes
+    count = len(edges)
+    start = rng.randrange(count)
+    safe_edge = -1
+    for i in range(count):
+        edge = edges[(start + i) % count]
+        sides = [box_sides[b] for b in edge_boxes[edge]]
+        if 3 in sides:
+            return edge
+        elif safe_edge < 0 and 2 not in sides:
+            if position.capturable_boxes == 0:
+                return edge
+            safe_edge = edge
+    return safe_edge if safe_edge >= 0 else edges[start]
+
+
+def _candidate_edges(position: SearchPosition, policy: RolloutPolicy) -> list[int]:
+    # The tree expands the moves its playouts would consider, otherwise the value of a sacrifice
+    # is averaged over every reply the opponent has instead of the capture it would make
+    if policy == RolloutPolicy.RANDOM:
+        return list(position.available)
+    box_sides, edge_boxes = position.box_sides, position.geometry.edge_boxes
+    safe_edges = []
+    for edge in position.available:
+        sides = [box_sides[b] for b in edge_boxes[edge]]
+        if 3 in sides:
+            return [e for e in position.available if 3 in [box_sides[b] for b in edge_boxes[e]]]
+        elif 2 not in sides:
+            safe_edges.append(edge)
+    return safe_edges if len(safe_edges) > 0 else list(position.available)
+
+
+def playout(position: SearchPosition, to_move: int, scores: list[float], rng: random.Random, policy: RolloutPolicy) -> list[float]:
+    scores = list(scores)
+    made = []
+    while position.remaining > 0:
+        edge = _choose_playout_edge(position, rng, policy)
+        completed = position.make(edge)
+        made.append(edge)
+        if completed > 0:
+            scores[to_move] += completed
+        else:
+            to_move = (to_move + 1) % len(scores)
+    for edge in reversed(made):
+        position.unmake(edge)
+    best_score = max(scores)
+    winners = [i for i, s in enumerate(scores) if math.fabs(s - best_score) < 0.01]
+    return [1.0 / len(winners) if i in winners else 0.0 for i in range(len(scores))]
+
+
+def run_playouts(size: tuple[int, int], drawn_mask: int, to_move: int, scores: list[float], count: int, seed: int,
+                 policy: RolloutPolicy) -> list[float]:
+    geometry = get_geometry(size[0], size[1])
+    position = SearchPosition(geometry, [e for e in range(geometry.edge_count) if (drawn_mask >> e) & 1])
+    rng = random.Random(seed)
+    totals = [0.0] * len(scores)
+    for _ in range(count):
+        for i, value in enumerate(playout(position, to_move, scores, rng, policy)):
+            totals[i] += value
+    return totals
+
+
+class MonteCarloNode:
+    def __init__(self, parent: Optional['MonteCarloNode'], edge: int, player: int, to_move: int, completed: int):
+        self.parent: Optional[MonteCarloNode] = parent
+        self.edge: int = edge
+        # player drew edge to reach this node, to_move draws next
+        self.player: int = player
+        self.to_move: int = to_move
+        self.completed: int = completed
+        self.children: dict[int, MonteCarloNode] = {}
+        self.untried: Optional[list[int]] = None
+        self.visits: float = 0.0
+        self.value: float = 0.0
+        self.virtual_visits: int = 0
+
+    def ucb_child(self, exploration: float) -> 'MonteCarloNode':
+        log_visits = math.log(max(1.0, self.visits + self.virtual_visits))
+        best_score, best_child = -math.inf, None
+        for child in self.children.values():
+            visits = child.visits + child.virtual_visits
+            score = child.value / visits + exploration * math.sqrt(log_visits / visits)
+            if score > best_score:
+                best_score, best_child = score, child
+        return best_child
+
+
+class MonteCarloTreeSearch:
+    # Simultaneous games are searched as if players alternated, which is what
+    # each player sees between two of its own moves
+    def __init__(self, playouts: int = 2000, time_limit: Optional[float] = None, workers: int = 1, batch_size: int = 8,
+                 playouts_per_leaf: int = 4, policy: RolloutPolicy = RolloutPolicy.HEURISTIC, exploration: float = 1.4):
+        self.playouts: int = playouts
+        self.time_limit: Optional[float] = time_limit
+        self.workers: int = workers if workers > 0 else (os.cpu_count() or 1)
+        self.batch_size: int = batch_size
+        self.playouts_per_leaf: int = playouts_per_leaf
+        self.policy: RolloutPolicy = policy
+        self.exploration: float = exploration
+        self.total_playouts: int = 0
+        self._root: Optional[MonteCarloNode] = None
+        self._root_moves: list[tuple[int, int]] = []
+
+    def reset(self):
+        self._root = None
+        self._root_moves = []
+
+    def _reuse_root(self, moves: list[tuple[int, int]], to_move: int) -> MonteCarloNode:
+        # Follow the (edge, player) moves made since the last search, the subtree only holds
+        # when every edge was drawn by the player the tree expected
+        node = self._root
+        root_length = len(self._root_moves)
+        if node is not None and moves[:root_length] == self._root_moves:
+            for edge, player in moves[root_length:]:
+                node = node.children.get(edge)
+                if node is None or node.player != player:
+                    node = None
+                    break
+            if node is not None and node.to_move == to_move:
+                node.parent = None
+                return node
+        return MonteCarloNode(None, -1, -1, to_move, 0)
+
+    def search(self, position: SearchPosition, to_move: int, scores: list[float], rng: random.Random,
+               moves: Optional[list[tuple[int, int]]] = None) -> int:
+        # moves are the (edge, player) pairs which led to position, without them the tree starts over
+        if position.remaining == 0:
+            raise ValueError("No available edge!")
+        if moves is None:
+            self.reset()
+            moves = []
+        root = self._reuse_root(moves, to_move)
+        self._root, self._root_moves = root, list(moves)
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        done = 0
+        while True:
+            leaves = [self._select(root, position, scores, rng) for _ in range(self.batch_size)]
+            results = self._evaluate(leaves, position.geometry, rng)
+            for (node, _, _, _), totals in zip(leaves, results):
+                self._backpropagate(node, totals, self.playouts_per_leaf)
+            done += len(leaves) * self.playouts_per_leaf
+            if done >= self.playouts or (deadline is not None and time.perf_counter() >= deadline):
+                break
+        self.total_playouts += done
+        best = max(root.children.values(), key=lambda x: x.visits)
+        return best.edge
+
+    def _select(self, root: MonteCarloNode, position: SearchPosition, scores: list[float],
+                rng: random.Random) -> tuple[MonteCarloNode, int, int, list[float]]:
+        node, made, scores = root, [], list(scores)
+        while True:
+            node.virtual_visits += 1
+            if node.untried is None:
+                node.untried = _candidate_edges(position, self.policy)
+                rng.shuffle(node.untried)
+            if len(node.untried) > 0:
+                edge = node.untried.pop()
+                completed = position.make(edge)
+                made.append(edge)
+                if completed > 0:
+                    scores[node.to_move] += completed
+                child = MonteCarloNode(node, edge, node.to_move, node.to_move if completed > 0 else (node.to_move + 1) % len(scores), completed)
+                node.children[edge] = child
+                child.virtual_visits += 1
+                node = child
+                break
+            elif len(node.children) == 0:
+                break
+            node = node.ucb_child(self.exploration)
+            position.make(node.edge)
+            made.append(node.edge)
+            scores[node.player] += node.completed
+        leaf = (node, position.mask, node.to_move, scores)
+        for edge in reversed(made):
+            position.unmake(edge)
+        return leaf
+
+    def _evaluate(self, leaves: list[tuple[MonteCarloNode, int, int, list[float]]], geometry: BoardGeometry, rng: random.Random) -> list[list[float]]:
+        size = (geometry.max_row, geometry.max_col)
+        tasks = [(size, mask, to_move, scores, self.playouts_per_leaf, rng.getrandbits(32), self.policy)
+                 for _, mask, to_move, scores in leaves]
+        if self.workers <= 1:
+            return [run_playouts(*task) for task in tasks]
+        executor = get_rollout_executor(self.workers)
+        return list(executor.map(run_playouts, *zip(*tasks)))
+
+    @staticmethod
+    def _backpropagate(node: MonteCarloNode, totals: list[float], count: int):
+        while node is not None:
+            node.virtual_visits -= 1
+            node.visits += count
+            if node.player >= 0:
+                node.value += totals[node.player]
+            node = node.parent
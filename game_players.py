@@ -1,9 +1,15 @@
 import abc
-import random
-
-from game_core import Player
+from typing import Optional
+
+from game_cache import open_position_cache
+from game_chains import ChainAnalyzer
+from game_core import Player, Board, TurnBasedBoard
+from game_evaluator import DEFAULT_SIDE_WEIGHTS, check_side_weights, get_smart_evaluator
+from game_mcts import MonteCarloTreeSearch
+from game_search import AlphaBetaSearch, SearchPosition, TranspositionTable, GameClock, Ponderer
+from game_tablebase import Tablebase
 from game_ui import input_line
-from game_utils import Line
+from game_utils import Line, RolloutPolicy
 
 
 class HumanPlayer(Player):
@@ -15,19 +21,7 @@ class HumanPlayer(Player):
 class ComputerPlayer(Player):
 
     def _get_available_lines(self) -> list[Line]:
-        board = self.get_game_board()
-        result = []
-        for x in range(board.max_row):
-            for y in range(board.max_col - 1):
-                line = Line((x, y), (x, y + 1))
-                if not board.has_line(line):
-                    result.append(line)
-        for y in range(board.max_col):
-            for x in range(board.max_row - 1):
-                line = Line((x, y), (x + 1, y))
-                if not board.has_line(line):
-                    result.append(line)
-        return result
+        return self.get_game_board().get_available_lines()
 
     @abc.abstractmethod
     def in_turn(self) -> Line:
@@ -37,37 +31,168 @@ class ComputerPlayer(Player):
 class RandomComputerPlayer(ComputerPlayer):
 
     def in_turn(self) -> Line:
-        available_lines = self._get_available_lines()
-        random.shuffle(available_lines)
-        return available_lines[0]
+        return self.get_game_board().get_random_available_line()
 
 
 class SmartComputerPlayer(ComputerPlayer):
+    def __init__(self, name: str, side_weights: tuple = DEFAULT_SIDE_WEIGHTS):
+        super().__init__(name)
+        # Score of drawing a side of a box which already has 0, 1, 2 or 3 sides
+        self.side_weights: tuple = check_side_weights(side_weights)
 
-    def _calculate_line_score(self, line: Line) -> int:
+    def _calculate_line_score(self, line: Line) -> float:
         board = self.get_game_board()
-        opposite_lines = board.generate_opposite_lines(line)
         score = 0
-        for opposite_line in opposite_lines:
-            side_line_1 = line.link_point_1(opposite_line)
-            side_line_2 = line.link_point_2(opposite_line)
-            exist_lines = list(filter(lambda x: board.has_line(x), [opposite_line, side_line_1, side_line_2]))
-            if len(exist_lines) == 3:
-                score += 3
-            elif len(exist_lines) == 2:
-                score -= 1
-            elif len(exist_lines) == 1:
-                score += 1
+        for exist_sides in board.get_adjacent_box_sides(line):
+            score += self.side_weights[exist_sides]
         return score
 
     def in_turn(self) -> Line:
+        board = self.get_game_board()
+        evaluator = get_smart_evaluator(board)
+        if evaluator is not None:
+            best_edges = evaluator.best_edges(board, self.side_weights)
+            board.rng.shuffle(best_edges)
+            return board.geometry.edge_line(best_edges[0])
         available_lines = self._get_available_lines()
         score_lines = [(self._calculate_line_score(i), i) for i in available_lines]
         score_lines = sorted(score_lines, key=lambda x: x[0], reverse=True)
         best_lines = [i for i in score_lines if score_lines[0][0] == i[0]]
-        random.shuffle(best_lines)
+        self.get_game_board().rng.shuffle(best_lines)
         return best_lines[0][1]
 
 
+class ChainComputerPlayer(SmartComputerPlayer):
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._analyzer: Optional[ChainAnalyzer] = None
+
+    def join_game(self, board: Board):
+        if self._analyzer is not None:
+            self._analyzer.close()
+        super().join_game(board)
+        self._analyzer = ChainAnalyzer(board)
+
+    def _get_endgame_line(self) -> Optional[Line]:
+        # Chain theory assumes alternating turns, simultaneous rounds keep the greedy heuristic
+        if not isinstance(self.get_game_board(), TurnBasedBoard):
+            return None
+        edge = self._analyzer.select_endgame_move()
+        return None if edge is None else self.get_game_board().geometry.edge_line(edge)
+
+    def in_turn(self) -> Line:
+        line = self._get_endgame_line()
+        return super().in_turn() if line is None else line
+
+
+class AlphaBetaComputerPlayer(ChainComputerPlayer):
+    def __init__(self, name: str, time_limit: float = 1.0, max_depth: int = 64, table_size_bits: int = 18,
+                 exact_endgame_lines: int = 16, cache_directory: Optional[str] = None):
+        super().__init__(name)
+        self.time_limit: float = time_limit
+        self.max_depth: int = max_depth
+        self.exact_endgame_lines: int = exact_endgame_lines
+        # Searches in every process using the same directory share evaluations per board size
+        self.cache_directory: Optional[str] = cache_directory
+        self._search: AlphaBetaSearch = AlphaBetaSearch(TranspositionTable(table_size_bits))
+
+    def join_game(self, board: Board):
+        super().join_game(board)
+        self._search.table.clear()
+        if self.cache_directory is not None:
+            self._search.cache = open_position_cache(self.cache_directory, board.max_row, board.max_col)
+
+    def in_turn(self) -> Line:
+        board = self.get_game_board()
+        # Negamax needs two sides taking turns, other games use the greedy heuristic
+        if not isinstance(board, TurnBasedBoard) or len(board.players) != 2:
+            return super().in_turn()
+        # Long endgames follow the chain rules instead of searching exponentially many lines
+        if board.available_line_count > self.exact_endgame_lines and self._analyzer.is_endgame():
+            return super().in_turn()
+        edge = self._search.search(SearchPosition.from_board(board), self.max_depth, self.time_limit)
+        return board.geometry.edge_line(edge)
+
+
+class TimedComputerPlayer(AlphaBetaComputerPlayer):
+    # Spends a budget from its clock on every move and thinks ahead while a human or remote player moves
+    def __init__(self, name: str, move_time: Optional[float] = 1.0, game_time: Optional[float] = None,
+                 ponder: bool = True, max_depth: int = 64, table_size_bits: int = 18, exact_endgame_lines: int = 16,
+                 cache_directory: Optional[str] = None):
+        super().__init__(name, move_time or 0.0, max_depth, table_size_bits, exact_endgame_lines, cache_directory)
+        self.clock: GameClock = GameClock(move_time, game_time)
+        self.ponder: bool = ponder
+        self._ponderer: Optional[Ponderer] = None
+
+    def join_game(self, board: Board):
+        if self._ponderer is not None:
+            self._ponderer.close()
+            self._ponderer = None
+        super().join_game(board)
+        self.clock.reset()
+        if self.ponder:
+            self._ponderer = Ponderer(board, self._search.table, self._should_ponder, self.max_depth)
+
+    def _should_ponder(self, board: Board, mover: Player, new_box_count: int) -> bool:
+        # Called before the turn passes on, a move completing boxes keeps the mover in turn
+        if not isinstance(board, TurnBasedBoard) or len(board.players) != 2:
+            return False
+        next_player = mover if new_box_count > 0 else board.players[1 - board.players.index(mover)]
+        # Pondering against another computer would only take CPU time from its own search
+        return next_player != self and not isinstance(next_player, ComputerPlayer)
+
+    def in_turn(self) -> Line:
+        if self._ponderer is not None:
+            self._ponderer.stop()
+        board = self.get_game_board()
+        self.time_limit = self.clock.budget(board.available_line_count // len(board.players))
+        self.clock.start()
+        try:
+            return super().in_turn()
+        finally:
+            self.clock.stop()
+
+
+class MonteCarloComputerPlayer(ComputerPlayer):
+    def __init__(self, name: str, playouts: int = 2000, time_limit: Optional[float] = None, workers: int = 1,
+                 policy: RolloutPolicy = RolloutPolicy.HEURISTIC):
+        super().__init__(name)
+        self._search: MonteCarloTreeSearch = MonteCarloTreeSearch(playouts, time_limit, workers, policy=policy)
+
+    def join_game(self, board: Board):
+        super().join_game(board)
+        self._search.reset()
+
+    def in_turn(self) -> Line:
+        board = self.get_game_board()
+        # Lines drawn by several players at once have no mover in the alternating tree
+        moves = [(edge, board.players.index(players[0]) if len(players) == 1 else -1)
+                 for edge, players in board.get_move_history()]
+        edge = self._search.search(SearchPosition.from_board(board), board.players.index(self),
+                                   [p.score for p in board.players], board.rng, moves)
+        return board.geometry.edge_line(edge)
+
+
+class TablebaseComputerPlayer(ChainComputerPlayer):
+    def __init__(self, name: str, directory: str = "tablebases"):
+        super().__init__(name)
+        self.directory: str = directory
+        self._tablebase: Optional[Tablebase] = None
+
+    def join_game(self, board: Board):
+        super().join_game(board)
+        if self._tablebase is not None:
+            self._tablebase.close()
+        self._tablebase = Tablebase.open_for((board.max_row, board.max_col), self.directory)
+
+    def in_turn(self) -> Line:
+        board = self.get_game_board()
+        # Table values assume two players taking turns
+        if self._tablebase is None or not isinstance(board, TurnBasedBoard) or len(board.players) != 2:
+            return super().in_turn()
+        mask = SearchPosition.from_board(board).mask
+        return board.geometry.edge_line(board.rng.choice(self._tablebase.best_edges(mask)))
+
+
 def is_computer_players(*players: Player):
     return all([isinstance(p, ComputerPlayer) for p in players])
@@ -0,0 +1,423 @@
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from string import ascii_uppercase
+from typing import Optional, TextIO
+
+from game_core import Player, Board, TurnBasedBoard, SimultaneousBoard
+from game_engine import BoardGeometry
+from game_players import ComputerPlayer, RandomComputerPlayer, SmartComputerPlayer, ChainComputerPlayer, \
+    AlphaBetaComputerPlayer, MonteCarloComputerPlayer
+from game_ui import parse_line, format_line
+from game_utils import Line, GameType, EngineType, BotType
+
+# Requests, one per line:
+#   protocol                                      -> protocol dox 2
+#   ping [token]                                  -> pong [token]
+#   new rows,columns [GAME_TYPE] [players] [seed] -> state ...
+#   move x1 y1 x2 y2                              turn based games
+#   move x1 y1 x2 y2;x1 y1 x2 y2;-                simultaneous games, one line or '-' per current player in order
+#   undo | redo | state                           -> state ...
+#   go [bot=TYPE] [movetime=ms] [player=NAME]     -> bestmove POSITION NAME x1 y1 x2 y2, one per asked player, answered
+#                                                    asynchronously so other requests keep flowing
+#   quit
+# Replies:
+#   state POSITION TURN|END names,... NAME:score  names are the players to move, or the winners once the game ends
+#   conflict x1 y1 x2 y2;...                      nothing was drawn
+#   error message
+# POSITION changes with every new, move, undo and redo. They cancel the pending go requests, and replies
+# the engine already sent for an older POSITION are stale.
+PROTOCOL_VERSION = 2
+_DEFAULT_MOVE_TIME = 1000
+_WORKER_BOARDS = 8
+
+# (edge, indexes of the players who drew it) for every line of a move
+Round = tuple[tuple[int, tuple[int, ...]], ...]
+
+
+class EnginePlayer(Player):
+    # Seat whose moves arrive through the protocol
+
+    def in_turn(self) -> Line:
+        raise SystemError(f"{self} moves arrive from the engine protocol!")
+
+
+def _create_bot(bot_type: BotType, name: str, time_limit: float) -> ComputerPlayer:
+    if bot_type == BotType.RANDOM:
+        return RandomComputerPlayer(name)
+    elif bot_type == BotType.SMART:
+        return SmartComputerPlayer(name)
+    elif bot_type == BotType.CHAIN:
+        return ChainComputerPlayer(name)
+    elif bot_type == BotType.ALPHA_BETA:
+        return AlphaBetaComputerPlayer(name, time_limit=time_limit)
+    elif bot_type == BotType.MONTE_CARLO:
+        return MonteCarloComputerPlayer(name, time_limit=time_limit)
+    else:
+        raise SystemError(f"Unhandled bot type {bot_type}!")
+
+
+def _create_board(game_type: GameType, size: tuple[int, int], players: list[Player], seed: Optional[int]) -> Board:
+    if game_type == GameType.TURN_BASED:
+        return TurnBasedBoard(size, players, EngineType.BITBOARD, seed)
+    elif game_type == GameType.SIMULTANEOUS:
+        return SimultaneousBoard(size, players, EngineType.BITBOARD, seed)
+    else:
+        raise SystemError(f"Unhandled game type {game_type}!")
+
+
+def _apply_round(board: Board, move: Round):
+    players = board.players
+    if isinstance(board, TurnBasedBoard):
+        board.draw_line(board.geometry.edge_line(move[0][0]))
+    elif isinstance(board, SimultaneousBoard):
+        board.draw_line_players({board.geometry.edge_line(e): [players[i] for i in indexes] for e, indexes in move})
+    else:
+        raise SystemError(f"Unhandled board {board.board_name}!")
+
+
+class BotRequest:
+    def __init__(self, game_type: GameType, size: tuple[int, int], player_count: int, seed: Optional[int],
+                 first_player: int, history: int, player_index: int, bot_type: BotType, time_limit: float):
+        self.game_type: GameType = game_type
+        self.size: tuple[int, int] = size
+        self.player_count: int = player_count
+        self.seed: Optional[int] = seed
+        self.first_player: int = first_player
+        # Changes whenever the rounds stop extending the previous ones, after new games and undos
+        self.history: int = history
+        self.player_index: int = player_index
+        self.bot_type: BotType = bot_type
+        self.time_limit: float = time_limit
+        # Filled by BotPool: the worker already has the first base rounds, moves are the rounds since
+        self.base: int = 0
+        self.moves: list[Round] = []
+        self.evicted: list[tuple] = []
+
+    @property
+    def game_key(self) -> tuple:
+        return self.game_type, self.size, self.player_count, self.seed, self.first_player, \
+            self.player_index, self.bot_type, self.time_limit
+
+
+class _WorkerGame:
+    def __init__(self, request: BotRequest):
+        players: list[Player] = [EnginePlayer(ascii_uppercase[i]) for i in range(request.player_count)]
+        self.bot: ComputerPlayer = _create_bot(request.bot_type, ascii_uppercase[request.player_index], request.time_limit)
+        players[request.player_index] = self.bot
+        # Seats sharing a seed would break ties identically and keep conflicting in simultaneous rounds
+        seed = None if request.seed is None else request.seed * len(ascii_uppercase) + request.player_index
+        self.board: Board = _create_board(request.game_type, request.size, players, seed)
+        if isinstance(self.board, TurnBasedBoard):
+            self.board.set_current_player(players[request.first_player])
+        self.history: int = request.history
+        self.round_count: int = 0
+
+
+# Each worker process keeps its games alive until BotPool evicts them, so bots keep their
+# analyzers and tables warm and requests only carry the moves made since the previous one
+_worker_games: dict[tuple, _WorkerGame] = {}
+
+
+def _worker_ready() -> bool:
+    return True
+
+
+def _worker_choose_edge(request: BotRequest) -> int:
+    for key in request.evicted:
+        _worker_games.pop(key, None)
+    key = request.game_key
+    game = _worker_games.pop(key, None)
+    if request.base == 0:
+        game = _WorkerGame(request)
+    elif game is None or game.history != request.history or game.round_count != request.base:
+        raise ValueError("Bot lost its game, send go again!")
+    for move in request.moves:
+        _apply_round(game.board, move)
+    game.round_count = request.base + len(request.moves)
+    _worker_games[key] = game
+    return game.board.geometry.edge_of(game.bot.in_turn())
+
+
+class BotPool:
+    # Bots run in long lived worker processes, a slow search never blocks the protocol loop. Every game
+    # sticks to one worker, which runs its requests in order, so the pool knows the rounds each worker's
+    # games already have and only sends the ones since.
+    def __init__(self, workers: int = 2):
+        self._executors: list[ProcessPoolExecutor] = [ProcessPoolExecutor(max_workers=1) for _ in range(workers)]
+        # Start every worker up front so the first request doesn't pay for the imports
+        for future in [executor.submit(_worker_ready) for executor in self._executors]:
+            future.result()
+        # (history, round count) of every game kept by every worker, in least recently used order
+        self._synced: list[dict[tuple, tuple[int, int]]] = [{} for _ in range(workers)]
+        self._evicted: list[list[tuple]] = [[] for _ in range(workers)]
+        self._lock: threading.Lock = threading.Lock()
+
+    def request(self, request: BotRequest, rounds: list[Round]) -> Future:
+        key = request.game_key
+        worker = hash(key) % len(self._executors)
+        with self._lock:
+            synced, evicted = self._synced[worker], self._evicted[worker]
+            history, round_count = synced.pop(key, (None, 0))
+            request.base = round_count if history == request.history and round_count <= len(rounds) else 0
+            request.moves = rounds[request.base:]
+            synced[key] = (request.history, len(rounds))
+            while len(synced) > _WORKER_BOARDS:
+                evicted_key = next(iter(synced))
+                del synced[evicted_key]
+                evicted.append(evicted_key)
+            request.evicted, self._evicted[worker] = evicted, []
+            future = self._executors[worker].submit(_worker_choose_edge, request)
+        future.add_done_callback(lambda f: self._check_synced(f, worker, key))
+        return future
+
+    def _check_synced(self, future: Future, worker: int, key: tuple):
+        # A cancelled or failed request leaves the worker's game behind, the next request rebuilds it
+        if future.cancelled() or future.exception() is not None:
+            with self._lock:
+                if self._synced[worker].pop(key, None) is not None:
+                    self._evicted[worker].append(key)
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+class EngineSession:
+    def __init__(self, output: TextIO, pool: BotPool):
+        self.output: TextIO = output
+        self.pool: BotPool = pool
+        self.board: Optional[Board] = None
+        self.game_type: GameType = GameType.TURN_BASED
+        self._first_player: int = 0
+        self._rounds: list[Round] = []
+        self._redo_rounds: list[Round] = []
+        self._position: int = 0
+        self._history: int = 0
+        self._output_lock: threading.Lock = threading.Lock()
+        self._pending: set[Future] = set()
+
+    def send(self, message: str, position: Optional[int] = None):
+        with self._output_lock:
+            # Replies computed for an older position are dropped
+            if position is not None and position != self._position:
+                return
+            self.output.write(message + "\n")
+            self.output.flush()
+
+    def _change_position(self, history_changed: bool = False):
+        with self._output_lock:
+            self._position += 1
+        if history_changed:
+            self._history += 1
+        for future in self._pending_futures():
+            future.cancel()
+
+    def handle(self, content: str) -> bool:
+        command, _, argument = content.strip().partition(" ")
+        command = command.lower()
+        if len(command) == 0:
+            return True
+        if command == "quit":
+            return False
+        try:
+            if command == "protocol":
+                self.send(f"protocol dox {PROTOCOL_VERSION}")
+            elif command == "ping":
+                self.send(f"pong {argument}".rstrip())
+            elif command == "new":
+                self._new_game(argument)
+            elif command == "move":
+                self._move(argument)
+            elif command == "undo":
+                self._undo()
+            elif command == "redo":
+                self._redo()
+            elif command == "state":
+                self._send_state()
+            elif command == "go":
+                self._go(argument)
+            else:
+                raise ValueError(f"Unknown command {command}!")
+        except ValueError as e:
+            self.send(f"error {e}")
+        except Exception as e:
+            # A bug in one request mustn't take the engine down with the client's game
+            self.send(f"error Unexpected {type(e).__name__} {e}")
+        return True
+
+    def _pending_futures(self) -> list[Future]:
+        with self._output_lock:
+            return list(self._pending)
+
+    def wait(self):
+        for future in self._pending_futures():
+            future.exception()
+
+    def _get_board(self) -> Board:
+        if self.board is None:
+            raise ValueError("No game, send 'new' first!")
+        return self.board
+
+    def _new_game(self, argument: str):
+        arguments = argument.split()
+        try:
+            rows, columns = arguments[0].split(",")
+            size = (int(rows), int(columns))
+            game_type = GameType(arguments[1].upper()) if len(arguments) > 1 else GameType.TURN_BASED
+            player_count = int(arguments[2]) if len(arguments) > 2 else 2
+            seed = int(arguments[3]) if len(arguments) > 3 else None
+        except (ValueError, IndexError):
+            raise ValueError("Format: new rows,columns [GAME_TYPE] [players] [seed]")
+        if not 2 <= player_count <= len(ascii_uppercase):
+            raise ValueError(f"Player amount should between 2 and {len(ascii_uppercase)}!")
+        players: list[Player] = [EnginePlayer(ascii_uppercase[i]) for i in range(player_count)]
+        self.board = _create_board(game_type, size, players, seed)
+        self.game_type = game_type
+        self._first_player = self.board.players.index(self.board.get_current_player()) \
+            if isinstance(self.board, TurnBasedBoard) else 0
+        self._rounds = []
+        self._redo_rounds = []
+        self._change_position(history_changed=True)
+        self._send_state()
+
+    def _current_players(self) -> list[Player]:
+        board = self._get_board()
+        if board.is_game_finish():
+            return []
+        elif isinstance(board, TurnBasedBoard):
+            return [board.get_current_player()]
+        elif isinstance(board, SimultaneousBoard):
+            return list(board.get_current_players())
+        else:
+            raise SystemError(f"Unhandled board {board.board_name}!")
+
+    def _parse_new_line(self, content: str) -> Line:
+        board = self._get_board()
+        line = parse_line(content.strip())
+        if board.has_line(line):
+            raise ValueError(f"Line {format_line(line)} already exists!")
+        elif not board.check_line(line):
+            raise ValueError(f"Invalid line {format_line(line)}!")
+        return line
+
+    def _move(self, argument: str):
+        board = self._get_board()
+        players = self._current_players()
+        if len(players) == 0:
+            raise ValueError("Game finished!")
+        if isinstance(board, TurnBasedBoard):
+            line = self._parse_new_line(argument)
+            edge = board.geometry.edge_of(line)
+            move = ((edge, (board.players.index(players[0]),)),)
+            board.draw_line(line)
+        elif isinstance(board, SimultaneousBoard):
+            contents = argument.split(";")
+            if len(contents) != len(players):
+                raise ValueError(f"Expect {len(players)} lines separated by ';'!")
+            line_players: dict[Line, list[Player]] = {}
+            for player, content in zip(players, contents):
+                if content.strip() != "-":
+                    line_players.setdefault(self._parse_new_line(content), []).append(player)
+            conflict_lines = board.check_conflict_lines(line_players)
+            if len(conflict_lines) != 0:
+                self.send("conflict " + ";".join([format_line(line) for line in conflict_lines]))
+                return
+            move = tuple((board.geometry.edge_of(line), tuple(board.players.index(p) for p in line_owners))
+                         for line, line_owners in line_players.items())
+            board.draw_line_players(line_players)
+        else:
+            raise SystemError(f"Unhandled board {board.board_name}!")
+        self._rounds.append(move)
+        self._redo_rounds = []
+        self._change_position()
+        self._send_state()
+
+    def _check_undo_supported(self):
+        if not isinstance(self._get_board(), TurnBasedBoard):
+            raise ValueError("Undo is only supported in turn based games!")
+
+    def _undo(self):
+        self._check_undo_supported()
+        if not self.board.can_undo:
+            raise ValueError("No move to undo!")
+        self.board.undo()
+        self._redo_rounds.append(self._rounds.pop())
+        self._change_position(history_changed=True)
+        self._send_state()
+
+    def _redo(self):
+        self._check_undo_supported()
+        if not self.board.can_redo:
+            raise ValueError("No move to redo!")
+        self.board.redo()
+        self._rounds.append(self._redo_rounds.pop())
+        self._change_position()
+        self._send_state()
+
+    def _send_state(self):
+        board = self._get_board()
+        if board.is_game_finish():
+            status, names = "END", [p.player_name for p in board.get_winner()]
+        else:
+            status, names = "TURN", [p.player_name for p in self._current_players()]
+        scores = " ".join([f"{p.player_name}:{p.score:.1f}" for p in board.players])
+        self.send(f"state {self._position} {status} {','.join(names)} {scores}")
+
+    def _go(self, argument: str):
+        board = self._get_board()
+        options = {}
+        for option in argument.split():
+            name, _, value = option.partition("=")
+            options[name.lower()] = value
+        try:
+            bot_type = BotType(options.pop("bot", BotType.SMART.value).upper())
+            time_limit = int(options.pop("movetime", _DEFAULT_MOVE_TIME)) / 1000
+        except ValueError:
+            raise ValueError("Format: go [bot=TYPE] [movetime=ms] [player=NAME]")
+        current_players = self._current_players()
+        if len(current_players) == 0:
+            raise ValueError("Game finished!")
+        if "player" in options:
+            name = options.pop("player").upper()
+            if name not in [p.player_name for p in board.players]:
+                raise ValueError(f"Unknown player {name}!")
+            players = [p for p in current_players if p.player_name == name]
+            if len(players) == 0:
+                raise ValueError(f"Player {name} isn't in turn!")
+        else:
+            players = current_players
+        if len(options) != 0:
+            raise ValueError(f"Unknown options {','.join(options)}!")
+        for player in players:
+            request = BotRequest(self.game_type, (board.max_row, board.max_col), len(board.players), board.seed,
+                                 self._first_player, self._history, board.players.index(player), bot_type, time_limit)
+            future = self.pool.request(request, self._rounds)
+            with self._output_lock:
+                self._pending.add(future)
+            future.add_done_callback(lambda f, p=player, g=board.geometry, i=self._position:
+                                     self._send_best_move(f, p, g, i))
+
+    def _send_best_move(self, future: Future, player: Player, geometry: BoardGeometry, position: int):
+        with self._output_lock:
+            self._pending.discard(future)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.send(f"error {player.player_name} {error}", position)
+        else:
+            line = format_line(geometry.edge_line(future.result()))
+            self.send(f"bestmove {position} {player.player_name} {line}", position)
+
+
+def run_engine(workers: int = 2, input_stream: TextIO = sys.stdin, output: TextIO = sys.stdout):
+    pool = BotPool(workers)
+    session = EngineSession(output, pool)
+    try:
+        for content in input_stream:
+            if not session.handle(content):
+                break
+        session.wait()
+    finally:
+        pool.close()
@@ -0,0 +1,189 @@
+import mmap
+import struct
+from typing import BinaryIO, Iterator, Optional
+
+from game_core import Board, BoardListener, Player, TurnBasedBoard, SimultaneousBoard
+from game_utils import Box, GameType, EngineType
+
+_MAGIC = b"DOXR"
+_VERSION = 2
+# magic, version, game type, has seed, rows, columns, seed, player count
+_HEADER = struct.Struct("<4sBBBHHQB")
+# edge id, bit mask of the players who drew it, turn state before the move: the index of the current
+# player on turn based boards, the bit mask of the players who continue on simultaneous boards
+_MOVE = struct.Struct("<IBB")
+# Written on close, the turn state after the last move
+_TURN = struct.Struct("<B")
+_GAME_TYPES = [GameType.TURN_BASED, GameType.SIMULTANEOUS]
+_MAX_PLAYERS = 8
+
+
+def _game_type_of(board: Board) -> GameType:
+    if isinstance(board, TurnBasedBoard):
+        return GameType.TURN_BASED
+    elif isinstance(board, SimultaneousBoard):
+        return GameType.SIMULTANEOUS
+    else:
+        raise SystemError(f"Unhandled board {board.board_name}!")
+
+
+def _pack_text(text: str) -> bytes:
+    content = text.encode("utf-8")
+    if len(content) > 255:
+        raise ValueError(f"Text {text} too long!")
+    return bytes([len(content)]) + content
+
+
+class GameRecorder(BoardListener):
+    def __init__(self, board: Board, path: str, flush_every_move: bool = False):
+        if len(board.players) > _MAX_PLAYERS:
+            raise ValueError(f"Game records support at most {_MAX_PLAYERS} players!")
+        self.board: Board = board
+        self.flush_every_move: bool = flush_every_move
+        self._player_bits: dict[Player, int] = {p: 1 << i for i, p in enumerate(board.players)}
+        # Pack the header first, so a game that can't be recorded leaves no file behind
+        header = self._pack_header()
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(header)
+        self._header_size: int = len(header)
+        board.add_listener(self)
+
+    def _pack_header(self) -> bytes:
+        board = self.board
+        if board.seed is not None and not 0 <= board.seed < 1 << 64:
+            raise ValueError(f"Seed {board.seed} can't be recorded!")
+        header = _HEADER.pack(_MAGIC, _VERSION, _GAME_TYPES.index(_game_type_of(board)), board.seed is not None,
+                              board.max_row, board.max_col, board.seed or 0, len(board.players))
+        return header + b"".join([_pack_text(p.player_name) + _pack_text(p.player_type) for p in board.players])
+
+    def on_line_added(self, board: Board, edge: int, players: list[Player], new_boxes: dict[Box, list[Player]]):
+        player_mask = 0
+        for player in players:
+            player_mask |= self._player_bits[player]
+        # Listeners run before the board passes the turn on, so this is still the state before the move
+        # noinspection PyProtectedMember
+        self._file.write(_MOVE.pack(edge, player_mask, board._get_turn_state()))
+        if self.flush_every_move:
+            self._file.flush()
+
+    def on_line_removed(self, board: Board, edge: int, players: list[Player], removed_boxes: list[Box]):
+        self._file.seek(-_MOVE.size, 1)
+        self._file.truncate()
+        if self.flush_every_move:
+            self._file.flush()
+
+    def on_reset(self, board: Board):
+        self._file.seek(self._header_size)
+        self._file.truncate()
+
+    def close(self):
+        self.board.remove_listener(self)
+        # noinspection PyProtectedMember
+        self._file.write(_TURN.pack(self.board._get_turn_state()))
+        self._file.close()
+
+
+class ReplayPlayer(Player):
+    def __init__(self, name: str, recorded_type: str):
+        super().__init__(name)
+        self.recorded_type: str = recorded_type
+
+    @property
+    def player_type(self):
+        return self.recorded_type
+
+    def in_turn(self):
+        raise SystemError(f"{self} can't play in a replay!")
+
+
+class GameRecordReader:
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._map: mmap.mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, game_type, has_seed, rows, cols, seed, player_count = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError(f"{path} isn't a game record!")
+        self.game_type: GameType = _GAME_TYPES[game_type]
+        self.size: tuple[int, int] = (rows, cols)
+        self.seed: Optional[int] = seed if has_seed else None
+        self.players: list[tuple[str, str]] = []
+        offset = _HEADER.size
+        for _ in range(player_count):
+            name, offset = self._read_text(offset)
+            player_type, offset = self._read_text(offset)
+            self.players.append((name, player_type))
+        self._moves_offset: int = offset
+
+    def _read_text(self, offset: int) -> tuple[str, int]:
+        length = self._map[offset]
+        return self._map[offset + 1:offset + 1 + length].decode("utf-8"), offset + 1 + length
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    @property
+    def move_count(self) -> int:
+        return (len(self._map) - self._moves_offset) // _MOVE.size
+
+    def move(self, index: int) -> tuple[int, tuple[int, ...]]:
+        if not 0 <= index < self.move_count:
+            raise IndexError(f"Move {index} out of range!")
+        edge, player_mask, _ = _MOVE.unpack_from(self._map, self._moves_offset + index * _MOVE.size)
+        return edge, self._player_indexes(player_mask)
+
+    def turn_state(self, index: int) -> Optional[int]:
+        # Before move index, None after the last move of a record which wasn't closed
+        if index < self.move_count:
+            return _MOVE.unpack_from(self._map, self._moves_offset + index * _MOVE.size)[2]
+        end = self._moves_offset + self.move_count * _MOVE.size
+        return _TURN.unpack_from(self._map, end)[0] if len(self._map) - end == _TURN.size else None
+
+    @staticmethod
+    def _player_indexes(player_mask: int) -> tuple[int, ...]:
+        return tuple(i for i in range(_MAX_PLAYERS) if player_mask >> i & 1)
+
+    def raw_moves(self, count: Optional[int] = None) -> Iterator[tuple[int, int, int]]:
+        count = self.move_count if count is None else min(count, self.move_count)
+        view = memoryview(self._map)[self._moves_offset:self._moves_offset + count * _MOVE.size]
+        try:
+            yield from _MOVE.iter_unpack(view)
+        finally:
+            view.release()
+
+    def moves(self, count: Optional[int] = None) -> Iterator[tuple[int, tuple[int, ...]]]:
+        for edge, player_mask, _ in self.raw_moves(count):
+            yield edge, self._player_indexes(player_mask)
+
+    def edges_at(self, count: int) -> int:
+        mask = 0
+        for edge, _, _ in self.raw_moves(count):
+            mask |= 1 << edge
+        return mask
+
+    def replay(self, count: Optional[int] = None, engine_type: EngineType = EngineType.BITBOARD) -> Board:
+        players = [ReplayPlayer(name, player_type) for name, player_type in self.players]
+        if self.game_type == GameType.TURN_BASED:
+            board = TurnBasedBoard(self.size, players, engine_type, self.seed)
+        else:
+            board = SimultaneousBoard(self.size, players, engine_type, self.seed)
+        count = self.move_count if count is None else min(count, self.move_count)
+        # Every move is drawn in the turn state it was recorded in, so undo on the replayed board
+        # restores the same turns as in the recorded game
+        for edge, player_mask, turn_state in self.raw_moves(count):
+            line = board.geometry.edge_line(edge)
+            if isinstance(board, TurnBasedBoard):
+                board.set_current_player(players[turn_state])
+                board.draw_line(line)
+            else:
+                board.set_continue_players([players[i] for i in self._player_indexes(turn_state)])
+                board.draw_line_players({line: [players[i] for i in self._player_indexes(player_mask)]})
+        # A simultaneous round may draw several lines, the turn state after them is the recorded one
+        turn_state = self.turn_state(count)
+        if turn_state is not None:
+            if isinstance(board, TurnBasedBoard):
+                board.set_current_player(players[turn_state])
+            else:
+                board.set_continue_players([players[i] for i in self._player_indexes(turn_state)])
+        return board
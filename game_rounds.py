@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Optional
+
+from game_core import Player, Board
+from game_utils import Line, TimeoutPolicy
+
+
+def get_timeout_line(board: Board, policy: TimeoutPolicy) -> Optional[Line]:
+    if policy == TimeoutPolicy.RANDOM_MOVE:
+        return board.get_random_available_line()
+    elif policy == TimeoutPolicy.SKIP_TURN:
+        return None
+    else:
+        raise SystemError(f"Unhandled timeout policy {policy}!")
+
+
+class MoveCollector:
+    # Players think in parallel threads, so a round lasts as long as its slowest player.
+    # A player still thinking on a previous round's board is never asked twice at the same
+    # time, it times out again until the abandoned call returns.
+    def __init__(self, get_line: Callable[[Player], Line], deadline: Optional[float] = None,
+                 policy: TimeoutPolicy = TimeoutPolicy.RANDOM_MOVE, workers: Optional[int] = None):
+        self.get_line: Callable[[Player], Line] = get_line
+        self.deadline: Optional[float] = deadline
+        self.policy: TimeoutPolicy = policy
+        self.timed_out: list[Player] = []
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dox-move")
+        self._abandoned: dict[Player, Future] = {}
+
+    def _is_busy(self, player: Player) -> bool:
+        future = self._abandoned.get(player)
+        if future is not None and future.done():
+            del self._abandoned[player]
+            return False
+        return future is not None
+
+    def collect(self, players: Iterable[Player], local_players: Iterable[Player] = ()) -> dict[Line, list[Player]]:
+        start_time = time.perf_counter()
+        local_players = list(local_players)
+        players = [p for p in players if p not in local_players]
+        self.timed_out = [p for p in players if self._is_busy(p)]
+        futures = {p: self._executor.submit(self.get_line, p) for p in players if p not in self.timed_out}
+        try:
+            player_lines = {p: self.get_line(p) for p in local_players}
+        except BaseException:
+            # A local command like 'u' or 'v x y' abandons the round, computer players still thinking
+            # must not be asked again before they answer
+            for player, future in futures.items():
+                if not future.done():
+                    self._abandoned[player] = future
+            raise
+        timeout = None if self.deadline is None else max(0.0, self.deadline - (time.perf_counter() - start_time))
+        wait(futures.values(), timeout=timeout)
+        for player, future in futures.items():
+            if future.done():
+                player_lines[player] = future.result()
+            else:
+                self._abandoned[player] = future
+                self.timed_out.append(player)
+        for player in self.timed_out:
+            player_lines[player] = get_timeout_line(player.get_game_board(), self.policy)
+        line_players: dict[Line, list[Player]] = {}
+        for player, line in player_lines.items():
+            if line is not None:
+                line_players.setdefault(line, []).append(player)
+        return line_players
+
+    def close(self):
+        self._abandoned = {}
+        self._executor.shutdown(wait=False, cancel_futures=True)
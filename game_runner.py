@@ -0,0 +1,159 @@
+import time
+from string import ascii_uppercase
+from typing import Callable, Optional
+
+from game_core import Player, Board, TurnBasedBoard, SimultaneousBoard
+from game_players import is_computer_players
+from game_record import GameRecorder
+from game_rounds import MoveCollector
+from game_utils import Line, GameType, EngineType, TimeoutPolicy
+
+PlayerFactory = Callable[[str], Player]
+
+
+class ConflictStalemate(SystemError):
+    pass
+
+
+class GameResult:
+    def __init__(self, size: tuple[int, int], game_type: GameType, seed: Optional[int],
+                 player_names: list[str], player_types: list[str], scores: list[float], winners: list[str],
+                 moves: list[tuple[int, tuple[int, ...]]], decision_times: list[float], duration: float):
+        self.size: tuple[int, int] = size
+        self.game_type: GameType = game_type
+        self.seed: Optional[int] = seed
+        self.player_names: list[str] = player_names
+        self.player_types: list[str] = player_types
+        self.scores: list[float] = scores
+        self.winners: list[str] = winners
+        # (edge id, indexes of the players who drew it) in drawing order
+        self.moves: list[tuple[int, tuple[int, ...]]] = moves
+        self.decision_times: list[float] = decision_times
+        self.duration: float = duration
+
+    @property
+    def is_tie(self) -> bool:
+        return len(self.winners) != 1
+
+    def to_dict(self) -> dict:
+        return {
+            "size": list(self.size),
+            "game_type": self.game_type.value,
+            "seed": self.seed,
+            "player_names": self.player_names,
+            "player_types": self.player_types,
+            "scores": self.scores,
+            "winners": self.winners,
+            "moves": [[edge, list(players)] for edge, players in self.moves],
+            "decision_times": self.decision_times,
+            "duration": self.duration,
+        }
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        scores = ", ".join([f"{n}: {s:.1f}" for n, s in zip(self.player_names, self.scores)])
+        return f"GameResult({self.size[0]}x{self.size[1]} {self.game_type.value} {scores} in {self.duration:.4f}s)"
+
+
+class HeadlessGame:
+    def __init__(self, size: tuple[int, int], game_type: GameType, player_factories: list[PlayerFactory],
+                 seed: Optional[int] = None, engine_type: EngineType = EngineType.BITBOARD, max_conflict_rounds: int = 1000,
+                 record_path: Optional[str] = None, round_deadline: Optional[float] = None,
+                 timeout_policy: TimeoutPolicy = TimeoutPolicy.RANDOM_MOVE):
+        players = [factory(ascii_uppercase[i]) for i, factory in enumerate(player_factories)]
+        if not is_computer_players(*players):
+            raise ValueError("Headless games only support computer players!")
+        if game_type == GameType.TURN_BASED:
+            self.board: Board = TurnBasedBoard(size, players, engine_type, seed)
+        elif game_type == GameType.SIMULTANEOUS:
+            self.board: Board = SimultaneousBoard(size, players, engine_type, seed)
+        else:
+            raise SystemError(f"Unhandled game type {game_type}!")
+        self.game_type: GameType = game_type
+        self.record_path: Optional[str] = record_path
+        self.max_conflict_rounds: int = max_conflict_rounds
+        # Without a deadline simultaneous moves are asked in order, which keeps seeded games reproducible
+        self.round_deadline: Optional[float] = round_deadline
+        self.timeout_policy: TimeoutPolicy = timeout_policy
+        self._player_indexes: dict[Player, int] = {p: i for i, p in enumerate(players)}
+        self._moves: list[tuple[int, tuple[int, ...]]] = []
+        self._decision_times: list[float] = [0.0] * len(players)
+
+    def play(self) -> GameResult:
+        recorder = None if self.record_path is None else GameRecorder(self.board, self.record_path)
+        start_time = time.perf_counter()
+        try:
+            if isinstance(self.board, TurnBasedBoard):
+                self._play_turn_based_game(self.board)
+            elif isinstance(self.board, SimultaneousBoard):
+                self._play_simultaneous_game(self.board)
+            else:
+                raise SystemError(f"Unhandled board {self.board.board_name}!")
+        finally:
+            if recorder is not None:
+                recorder.close()
+        duration = time.perf_counter() - start_time
+        players = self.board.players
+        return GameResult(
+            size=(self.board.max_row, self.board.max_col),
+            game_type=self.game_type,
+            seed=self.board.seed,
+            player_names=[p.player_name for p in players],
+            player_types=[p.player_type for p in players],
+            scores=[p.score for p in players],
+            winners=[p.player_name for p in self.board.get_winner()],
+            moves=self._moves,
+            decision_times=self._decision_times,
+            duration=duration
+        )
+
+    def _play_turn_based_game(self, board: TurnBasedBoard):
+        while not board.is_game_finish():
+            player = board.get_current_player()
+            line = self._get_player_line(player)
+            board.draw_line(line)
+            self._moves.append((board.geometry.edge_of(line), (self._player_indexes[player],)))
+
+    def _play_simultaneous_game(self, board: SimultaneousBoard):
+        collector = None if self.round_deadline is None else \
+            MoveCollector(self._get_player_line, self.round_deadline, self.timeout_policy)
+        conflict_rounds = 0
+        try:
+            while not board.is_game_finish():
+                if collector is None:
+                    line_players: dict[Line, list[Player]] = {}
+                    for player in board.get_current_players():
+                        line_players.setdefault(self._get_player_line(player), []).append(player)
+                else:
+                    line_players = collector.collect(board.get_current_players())
+                if len(board.check_conflict_lines(line_players)) != 0:
+                    conflict_rounds += 1
+                    if conflict_rounds >= self.max_conflict_rounds:
+                        raise ConflictStalemate(f"Players keep conflicting after {conflict_rounds} rounds!")
+                    continue
+                conflict_rounds = 0
+                board.draw_line_players(line_players)
+                for line, players in line_players.items():
+                    self._moves.append((board.geometry.edge_of(line), tuple(self._player_indexes[p] for p in players)))
+        finally:
+            if collector is not None:
+                collector.close()
+
+    def _get_player_line(self, player: Player) -> Line:
+        start_time = time.perf_counter()
+        line = player.in_turn()
+        self._decision_times[self._player_indexes[player]] += time.perf_counter() - start_time
+        board = player.get_game_board()
+        if board.has_line(line):
+            raise ValueError(f"{player} draw existing line {line}!")
+        elif not board.check_line(line):
+            raise ValueError(f"{player} draw invalid line {line}!")
+        return line
+
+
+def play_headless_game(size: tuple[int, int], game_type: GameType, player_factories: list[PlayerFactory],
+                       seed: Optional[int] = None, engine_type: EngineType = EngineType.BITBOARD,
+                       record_path: Optional[str] = None) -> GameResult:
+    return HeadlessGame(size, game_type, player_factories, seed, engine_type, record_path=record_path).play()
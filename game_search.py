@@ -0,0 +1,325 @@
+import functools
+import math
+import random
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from game_cache import PositionCache
+from game_core import Board, BoardListener, Player
+from game_utils import Box
+from game_engine import BoardGeometry, EdgePool
+from game_evaluator import DEFAULT_SIDE_WEIGHTS
+
+_EXACT = 0
+_LOWER_BOUND = 1
+_UPPER_BOUND = 2
+_INFINITY = 1 << 30
+_TIME_CHECK_INTERVAL = 1024
+
+
+@functools.lru_cache(maxsize=32)
+def get_zobrist_keys(max_row: int, max_col: int) -> tuple[int, ...]:
+    geometry_rng = random.Random(max_row * 100003 + max_col)
+    edge_count = max_row * (max_col - 1) + (max_row - 1) * max_col
+    return tuple(geometry_rng.getrandbits(64) for _ in range(edge_count))
+
+
+class SearchPosition:
+    # The value of a dots-and-boxes position only depends on the drawn edges,
+    # so the hash doesn't need to encode the player to move
+    def __init__(self, geometry: BoardGeometry, drawn_edges: Iterable[int] = ()):
+        self.geometry: BoardGeometry = geometry
+        self.keys: tuple[int, ...] = get_zobrist_keys(geometry.max_row, geometry.max_col)
+        self.mask: int = 0
+        self.hash: int = 0
+        self.box_sides: bytearray = bytearray(geometry.box_count)
+        self.capturable_boxes: int = 0
+        self.available: EdgePool = EdgePool(geometry.edge_count)
+        for edge in drawn_edges:
+            self.make(edge)
+
+    @staticmethod
+    def from_board(board: Board) -> 'SearchPosition':
+        return SearchPosition(board.geometry, board.get_drawn_edges())
+
+    @property
+    def remaining(self) -> int:
+        return len(self.available)
+
+    def make(self, edge: int) -> int:
+        self.mask |= 1 << edge
+        self.hash ^= self.keys[edge]
+        self.available.remove(edge)
+        completed = 0
+        for box in self.geometry.edge_boxes[edge]:
+            sides = self.box_sides[box] + 1
+            self.box_sides[box] = sides
+            if sides == 4:
+                completed += 1
+                self.capturable_boxes -= 1
+            elif sides == 3:
+                self.capturable_boxes += 1
+        return completed
+
+    def unmake(self, edge: int):
+        self.mask ^= 1 << edge
+        self.hash ^= self.keys[edge]
+        self.available.add(edge)
+        for box in self.geometry.edge_boxes[edge]:
+            sides = self.box_sides[box]
+            self.box_sides[box] = sides - 1
+            if sides == 4:
+                self.capturable_boxes += 1
+            elif sides == 3:
+                self.capturable_boxes -= 1
+
+    def move_score(self, edge: int, side_weights: tuple = DEFAULT_SIDE_WEIGHTS) -> int:
+        # SmartComputerPlayer's heuristic, the boxes of an available edge have at most 3 sides
+        box_sides = self.box_sides
+        return sum([side_weights[box_sides[box]] for box in self.geometry.edge_boxes[edge]])
+
+    def ordered_moves(self, first_move: int = -1) -> list[int]:
+        moves = sorted(self.available, key=self.move_score, reverse=True)
+        if first_move >= 0 and first_move in self.available:
+            moves.remove(first_move)
+            moves.insert(0, first_move)
+        return moves
+
+
+class TranspositionTable:
+    def __init__(self, size_bits: int = 18):
+        self._mask: int = (1 << size_bits) - 1
+        self._slots: list[Optional[tuple[int, int, int, int, int]]] = [None] * (1 << size_bits)
+
+    def clear(self):
+        self._slots = [None] * len(self._slots)
+
+    def get(self, key: int) -> Optional[tuple[int, int, int, int]]:
+        slot = self._slots[key & self._mask]
+        if slot is not None and slot[0] == key:
+            return slot[1], slot[2], slot[3], slot[4]
+        return None
+
+    def put(self, key: int, depth: int, value: int, flag: int, move: int):
+        index = key & self._mask
+        slot = self._slots[index]
+        if slot is None or slot[0] != key or slot[1] <= depth:
+            self._slots[index] = (key, depth, value, flag, move)
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class AlphaBetaSearch:
+    def __init__(self, table: Optional[TranspositionTable] = None, cache: Optional[PositionCache] = None,
+                 cache_min_depth: int = 3):
+        self.table: TranspositionTable = table if table is not None else TranspositionTable()
+        # Canonicalizing costs more than a table probe, so only deep nodes use the cache
+        self.cache: Optional[PositionCache] = cache
+        self.cache_min_depth: int = cache_min_depth
+        self.nodes: int = 0
+        self.depth: int = 0
+        self.value: int = 0
+        self._deadline: float = 0.0
+        self._stop_event: Optional[threading.Event] = None
+        self._position: Optional[SearchPosition] = None
+
+    def search(self, position: SearchPosition, max_depth: int, time_limit: float,
+               stop_event: Optional[threading.Event] = None) -> int:
+        # Anytime: the best move of the deepest finished iteration once time runs out or stop_event is set
+        if position.remaining == 0:
+            raise ValueError("No available edge!")
+        self._position = position
+        self._deadline = time.perf_counter() + time_limit
+        self._stop_event = stop_event
+        self.nodes = 0
+        self.depth = 0
+        best_move = position.ordered_moves()[0]
+        for depth in range(1, max_depth + 1):
+            try:
+                value, move = self._search_root(depth)
+            except SearchTimeout:
+                break
+            best_move, self.value, self.depth = move, value, depth
+            if depth >= position.remaining:
+                break
+        self._position = None
+        self._stop_event = None
+        return best_move
+
+    def _search_root(self, depth: int) -> tuple[int, int]:
+        position = self._position
+        entry = self.table.get(position.hash)
+        alpha, beta = -_INFINITY, _INFINITY
+        best_value, best_move = -_INFINITY, -1
+        for edge in position.ordered_moves(entry[3] if entry is not None else -1):
+            value = self._search_child(edge, depth, alpha, beta)
+            if value > best_value:
+                best_value, best_move = value, edge
+            alpha = max(alpha, value)
+        self.table.put(position.hash, depth, best_value, _EXACT, best_move)
+        if self.cache is not None and depth >= self.cache_min_depth:
+            self.cache.put(self.cache.position_key(position.mask), depth, best_value, _EXACT, best_move)
+        return best_value, best_move
+
+    def _search_child(self, edge: int, depth: int, alpha: int, beta: int) -> int:
+        position = self._position
+        completed = position.make(edge)
+        try:
+            if completed > 0:
+                # Completing a box gives the same player another turn
+                return completed + self._search(depth - 1, alpha - completed, beta - completed)
+            else:
+                return -self._search(depth - 1, -beta, -alpha)
+        finally:
+            position.unmake(edge)
+
+    def _search(self, depth: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if self.nodes % _TIME_CHECK_INTERVAL == 0 and (time.perf_counter() > self._deadline or
+                                                        self._stop_event is not None and self._stop_event.is_set()):
+            raise SearchTimeout
+        position = self._position
+        if position.remaining == 0:
+            return 0
+        if depth <= 0:
+            return position.capturable_boxes
+        original_alpha = alpha
+        tt_move = -1
+        entry = self.table.get(position.hash)
+        cache_key = None
+        if self.cache is not None and depth >= self.cache_min_depth:
+            cache_key = self.cache.position_key(position.mask)
+            if entry is None or entry[0] < depth:
+                cached = self.cache.get(cache_key)
+                if cached is not None and (entry is None or cached[0] > entry[0]):
+                    entry = cached
+        if entry is not None:
+            entry_depth, entry_value, entry_flag, tt_move = entry
+            if entry_depth >= depth:
+                if entry_flag == _EXACT:
+                    return entry_value
+                elif entry_flag == _LOWER_BOUND:
+                    alpha = max(alpha, entry_value)
+                elif entry_flag == _UPPER_BOUND:
+                    beta = min(beta, entry_value)
+                if alpha >= beta:
+                    return entry_value
+        best_value, best_move = -_INFINITY, -1
+        for edge in position.ordered_moves(tt_move):
+            value = self._search_child(edge, depth, alpha, beta)
+            if value > best_value:
+                best_value, best_move = value, edge
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+        if best_value <= original_alpha:
+            flag = _UPPER_BOUND
+        elif best_value >= beta:
+            flag = _LOWER_BOUND
+        else:
+            flag = _EXACT
+        self.table.put(position.hash, depth, best_value, flag, best_move)
+        if cache_key is not None:
+            self.cache.put(cache_key, depth, best_value, flag, best_move)
+        return best_value
+
+
+class GameClock:
+    # Budgets each move from a per move limit, a per game allowance or both
+    def __init__(self, move_time: Optional[float] = 1.0, game_time: Optional[float] = None, increment: float = 0.0,
+                 safety: float = 0.9):
+        if move_time is None and game_time is None:
+            raise ValueError("Clock needs a move time or a game time!")
+        self.move_time: Optional[float] = move_time
+        self.game_time: Optional[float] = game_time
+        self.increment: float = increment
+        # Searches only notice the deadline every few nodes, so budgets keep some margin
+        self.safety: float = safety
+        self.remaining: Optional[float] = game_time
+        self.used: float = 0.0
+        self._started_at: Optional[float] = None
+
+    def reset(self):
+        self.remaining = self.game_time
+        self.used = 0.0
+        self._started_at = None
+
+    def budget(self, moves_left: int) -> float:
+        budget = math.inf if self.move_time is None else self.move_time
+        if self.remaining is not None:
+            budget = min(budget, self.remaining / max(1, moves_left) + self.increment)
+        return max(0.0, budget * self.safety)
+
+    def start(self):
+        self._started_at = time.perf_counter()
+
+    def stop(self) -> float:
+        if self._started_at is None:
+            raise SystemError("Clock isn't running!")
+        elapsed = time.perf_counter() - self._started_at
+        self._started_at = None
+        self.used += elapsed
+        if self.remaining is not None:
+            self.remaining = max(0.0, self.remaining - elapsed + self.increment)
+        return elapsed
+
+
+class Ponderer(BoardListener):
+    # Searches the position in the background while the opponent thinks. It shares the table of
+    # the player's own search, which keys positions by their edges alone, so when the reply arrives
+    # the next search finds the subtree below it already explored.
+    def __init__(self, board: Board, table: TranspositionTable, should_ponder: Callable[[Board, Player, int], bool],
+                 max_depth: int = 64):
+        self.board: Board = board
+        self.should_ponder: Callable[[Board, Player, int], bool] = should_ponder
+        self.max_depth: int = max_depth
+        self.search: AlphaBetaSearch = AlphaBetaSearch(table)
+        self.predicted_edge: int = -1
+        self.pondered: int = 0
+        self.hits: int = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event: threading.Event = threading.Event()
+        board.add_listener(self)
+
+    @property
+    def is_pondering(self) -> bool:
+        return self._thread is not None
+
+    def on_line_added(self, board: Board, edge: int, players: list[Player], new_boxes: dict[Box, list[Player]]):
+        if self._thread is not None:
+            self.stop()
+            if edge == self.predicted_edge:
+                self.hits += 1
+        if not board.is_game_finish() and self.should_ponder(board, players[0], len(new_boxes)):
+            self.start(SearchPosition.from_board(board))
+
+    def on_line_removed(self, board: Board, edge: int, players: list[Player], removed_boxes: list[Box]):
+        self.stop()
+
+    def on_reset(self, board: Board):
+        self.stop()
+
+    def start(self, position: SearchPosition):
+        self.stop()
+        self.predicted_edge = -1
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._ponder, args=(position, self._stop_event), name="dox-ponder", daemon=True)
+        self._thread.start()
+
+    def _ponder(self, position: SearchPosition, stop_event: threading.Event):
+        self.predicted_edge = self.search.search(position, self.max_depth, math.inf, stop_event)
+
+    def stop(self):
+        # Called from the game thread before it searches, so the table never has two writers
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            self.pondered += 1
+
+    def close(self):
+        self.stop()
+        self.board.remove_listener(self)
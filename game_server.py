@@ -0,0 +1,437 @@
+import argparse
+import asyncio
+import itertools
+import random
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Optional
+
+from game_core import Player, Board, TurnBasedBoard, SimultaneousBoard
+from game_engine import get_geometry
+from game_players import ComputerPlayer, SmartComputerPlayer, RandomComputerPlayer, AlphaBetaComputerPlayer
+from game_ui import parse_line, format_line
+from game_rounds import get_timeout_line
+from game_utils import Line, PlayerType, GameType, EngineType, TimeoutPolicy
+
+# Client -> server:
+#   CREATE rows,columns GAME_TYPE PLAYER_TYPE    PLAYER_TYPE HUMANS waits for a JOIN from another connection
+#   JOIN game_id
+#   x1 y1 x2 y2 | (x1,y1)(x2,y2)                 only after TURN
+#   QUIT
+# Server -> client:
+#   GAME game_id | START game_id player_name rows,columns GAME_TYPE | TURN | MOVE player_name x1 y1 x2 y2
+#   CONFLICT x1 y1 x2 y2 | TIMEOUT player_name | SCORE name:score ... | END winner ... | ABORT reason | ERROR message
+MAX_LINE_LENGTH = 256
+MAX_BOARD_EDGES = 1 << 14
+# Bytes queued for a client which doesn't read before it gets dropped
+MAX_WRITE_BUFFER = 1 << 18
+# Larger boards are built in the executor instead of blocking the event loop
+_INLINE_BOARD_EDGES = 1 << 10
+
+
+def _edge_count(size: tuple[int, int]) -> int:
+    return size[0] * (size[1] - 1) + (size[0] - 1) * size[1]
+
+
+class ClientConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader: asyncio.StreamReader = reader
+        self.writer: asyncio.StreamWriter = writer
+        self.game: Optional[GameSession] = None
+        self.closed: bool = False
+        self._pending_move: Optional[asyncio.Future] = None
+
+    def send(self, message: str):
+        if not self.writer.is_closing():
+            self.writer.write(message.encode("utf-8") + b"\n")
+            if self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                self.disconnect()
+
+    async def request_move(self) -> str:
+        if self.closed:
+            raise ConnectionError("Player disconnected!")
+        self._pending_move = asyncio.get_running_loop().create_future()
+        self.send("TURN")
+        try:
+            return await self._pending_move
+        finally:
+            self._pending_move = None
+
+    def offer_move(self, content: str):
+        if self._pending_move is None or self._pending_move.done():
+            self.send("ERROR Not your turn!")
+        else:
+            self._pending_move.set_result(content)
+
+    def disconnect(self):
+        self.closed = True
+        if self._pending_move is not None and not self._pending_move.done():
+            self._pending_move.set_exception(ConnectionError("Player disconnected!"))
+        if not self.writer.is_closing():
+            self.writer.close()
+
+
+class RemotePlayer(Player):
+    def __init__(self, name: str, connection: ClientConnection):
+        super().__init__(name)
+        self.connection: ClientConnection = connection
+
+    def in_turn(self) -> Line:
+        raise SystemError(f"{self} moves arrive from its connection!")
+
+    async def in_turn_async(self) -> Line:
+        while True:
+            try:
+                line = parse_line(await self.connection.request_move())
+            except ValueError as e:
+                self.connection.send(f"ERROR {e}")
+                continue
+            board = self.get_game_board()
+            if board.has_line(line):
+                self.connection.send(f"ERROR Line {format_line(line)} already exists!")
+            elif not board.check_line(line):
+                self.connection.send(f"ERROR Invalid line {format_line(line)}!")
+            else:
+                return line
+
+
+class GameSession:
+    def __init__(self, game_id: int, size: tuple[int, int], game_type: GameType, players: list[Player], executor: Executor,
+                 seed: Optional[int] = None, round_deadline: Optional[float] = None,
+                 timeout_policy: TimeoutPolicy = TimeoutPolicy.RANDOM_MOVE):
+        self.game_id: int = game_id
+        self.size: tuple[int, int] = size
+        self.game_type: GameType = game_type
+        self.players: list[Player] = players
+        self.executor: Executor = executor
+        self.seed: Optional[int] = seed
+        self.round_deadline: Optional[float] = round_deadline
+        self.timeout_policy: TimeoutPolicy = timeout_policy
+        # Computer moves still running in the executor after their round gave up on them
+        self._abandoned: dict[Player, Future] = {}
+
+    @property
+    def remote_players(self) -> list[RemotePlayer]:
+        return [p for p in self.players if isinstance(p, RemotePlayer)]
+
+    def broadcast(self, message: str):
+        for player in self.remote_players:
+            player.connection.send(message)
+
+    def _is_busy(self, player: Player) -> bool:
+        future = self._abandoned.get(player)
+        if future is not None and future.done():
+            del self._abandoned[player]
+            return False
+        return future is not None
+
+    async def _get_line(self, player: Player) -> Line:
+        if isinstance(player, RemotePlayer):
+            return await player.in_turn_async()
+        future = self.executor.submit(player.in_turn)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A started call can't be cancelled, the player isn't asked again until it returns
+            if not future.done():
+                self._abandoned[player] = future
+            raise
+
+    async def play(self, board: Board):
+        for player in self.remote_players:
+            player.connection.send(f"START {self.game_id} {player.player_name} {self.size[0]},{self.size[1]} {self.game_type.value}")
+        if isinstance(board, TurnBasedBoard):
+            await self._play_turn_based_game(board)
+        elif isinstance(board, SimultaneousBoard):
+            await self._play_simultaneous_game(board)
+        else:
+            raise SystemError(f"Unhandled board {board.board_name}!")
+        self.broadcast("END " + " ".join([p.player_name for p in board.get_winner()]))
+
+    async def _play_turn_based_game(self, board: TurnBasedBoard):
+        while not board.is_game_finish():
+            player = board.get_current_player()
+            line = await self._get_line(player)
+            board.draw_line(line)
+            self.broadcast(f"MOVE {player.player_name} {format_line(line)}")
+            self._broadcast_scores(board)
+
+    async def _play_simultaneous_game(self, board: SimultaneousBoard):
+        while not board.is_game_finish():
+            players = list(board.get_current_players())
+            # Busy players are still computing an earlier round, they time out without being asked
+            tasks = {p: asyncio.ensure_future(self._get_line(p)) for p in players if not self._is_busy(p)}
+            try:
+                if len(tasks) > 0:
+                    await asyncio.wait(tasks.values(), timeout=self.round_deadline)
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+            line_players: dict[Line, list[Player]] = {}
+            for player in players:
+                task = tasks.get(player)
+                if task is None or task.cancelled():
+                    self.broadcast(f"TIMEOUT {player.player_name}")
+                    line = get_timeout_line(board, self.timeout_policy)
+                else:
+                    line = task.result()
+                if line is not None:
+                    line_players.setdefault(line, []).append(player)
+            conflict_lines = board.check_conflict_lines(line_players)
+            if len(conflict_lines) != 0:
+                for line in conflict_lines:
+                    self.broadcast(f"CONFLICT {format_line(line)}")
+                continue
+            board.draw_line_players(line_players)
+            for line, line_owners in line_players.items():
+                for player in line_owners:
+                    self.broadcast(f"MOVE {player.player_name} {format_line(line)}")
+            self._broadcast_scores(board)
+
+    def _broadcast_scores(self, board: Board):
+        self.broadcast("SCORE " + " ".join([f"{p.player_name}:{p.score:.1f}" for p in board.players]))
+
+    def _create_board(self) -> Board:
+        if self.game_type == GameType.TURN_BASED:
+            return TurnBasedBoard(self.size, self.players, EngineType.BITBOARD, self.seed)
+        elif self.game_type == GameType.SIMULTANEOUS:
+            return SimultaneousBoard(self.size, self.players, EngineType.BITBOARD, self.seed)
+        else:
+            raise SystemError(f"Unhandled game type {self.game_type}!")
+
+    async def run(self):
+        if _edge_count(self.size) > _INLINE_BOARD_EDGES:
+            board = await asyncio.get_running_loop().run_in_executor(self.executor, self._create_board)
+        else:
+            board = self._create_board()
+        try:
+            await self.play(board)
+        except ConnectionError as e:
+            self.broadcast(f"ABORT {e}")
+        finally:
+            for player in self.remote_players:
+                player.connection.game = None
+
+
+def _create_computer_player(player_type: PlayerType, name: str) -> ComputerPlayer:
+    if player_type == PlayerType.HUMAN_AND_RANDOM_COMPUTER:
+        return RandomComputerPlayer(name)
+    elif player_type == PlayerType.HUMAN_AND_SMART_COMPUTER:
+        return SmartComputerPlayer(name)
+    elif player_type == PlayerType.HUMAN_AND_SEARCH_COMPUTER:
+        return AlphaBetaComputerPlayer(name)
+    else:
+        raise SystemError(f"Unhandled player type {player_type}!")
+
+
+class GameServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, max_games: int = 4096, workers: int = 4,
+                 round_deadline: Optional[float] = None, timeout_policy: TimeoutPolicy = TimeoutPolicy.RANDOM_MOVE,
+                 max_edges: int = MAX_BOARD_EDGES):
+        self.host: str = host
+        self.port: int = port
+        self.max_games: int = max_games
+        self.max_edges: int = max_edges
+        self.round_deadline: Optional[float] = round_deadline
+        self.timeout_policy: TimeoutPolicy = timeout_policy
+        self.executor: Executor = ThreadPoolExecutor(max_workers=workers)
+        self.games: dict[int, GameSession] = {}
+        self._waiting_games: dict[int, tuple[GameSession, ClientConnection]] = {}
+        self._game_ids = itertools.count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+        # The event loop only keeps weak references to tasks
+        self._game_tasks: set[asyncio.Task] = set()
+        self._connection_tasks: set[asyncio.Task] = set()
+
+    @property
+    def address(self) -> tuple[str, int]:
+        if self._server is None:
+            raise SystemError("Server isn't running!")
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, limit=MAX_LINE_LENGTH)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+        tasks = list(self._game_tasks) + list(self._connection_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = ClientConnection(reader, writer)
+        task = asyncio.current_task()
+        self._connection_tasks.add(task)
+        try:
+            while True:
+                try:
+                    content = await reader.readline()
+                except ValueError:
+                    connection.send("ERROR Line too long!")
+                    break
+                if len(content) == 0:
+                    break
+                content = content.decode("utf-8", errors="replace").strip()
+                if content.upper() == "QUIT":
+                    break
+                elif connection.game is not None:
+                    connection.offer_move(content)
+                else:
+                    self._handle_command(connection, content)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # The stream callback reports cancelled handlers as errors, closing the server isn't one
+            pass
+        finally:
+            self._connection_tasks.discard(task)
+            self._drop_waiting_games(connection)
+            connection.disconnect()
+
+    def _handle_command(self, connection: ClientConnection, content: str):
+        command, _, argument = content.partition(" ")
+        try:
+            if command.upper() == "CREATE":
+                self._create_game(connection, argument)
+            elif command.upper() == "JOIN":
+                self._join_game(connection, argument)
+            else:
+                raise ValueError(f"Unknown command {command}!")
+        except ValueError as e:
+            connection.send(f"ERROR {e}")
+
+    def _create_game(self, connection: ClientConnection, argument: str):
+        try:
+            size, game_type, player_type = argument.split()
+            rows, columns = size.split(",")
+            size = (int(rows), int(columns))
+            game_type, player_type = GameType(game_type.upper()), PlayerType(player_type.upper())
+        except ValueError:
+            raise ValueError("Format: CREATE rows,columns GAME_TYPE PLAYER_TYPE")
+        if len(self.games) >= self.max_games:
+            raise ValueError("Server is full!")
+        if size[0] <= 3 or size[1] <= 3:
+            raise ValueError(f"Size ({size[0]},{size[1]}) too small!")
+        if _edge_count(size) > self.max_edges:
+            raise ValueError(f"Size ({size[0]},{size[1]}) too large, at most {self.max_edges} lines!")
+        game_id = next(self._game_ids)
+        if player_type == PlayerType.HUMANS:
+            players = [RemotePlayer("A", connection)]
+        else:
+            players = [RemotePlayer("A", connection), _create_computer_player(player_type, "B")]
+        session = GameSession(game_id, size, game_type, players, self.executor, random.getrandbits(32),
+                              self.round_deadline, self.timeout_policy)
+        self.games[game_id] = session
+        connection.game = session
+        connection.send(f"GAME {game_id}")
+        if len(players) == 1:
+            self._waiting_games[game_id] = (session, connection)
+        else:
+            self._start_game(session)
+
+    def _join_game(self, connection: ClientConnection, argument: str):
+        try:
+            game_id = int(argument)
+        except ValueError:
+            raise ValueError("Format: JOIN game_id")
+        if game_id not in self._waiting_games:
+            raise ValueError(f"Game {game_id} isn't waiting for players!")
+        session, _ = self._waiting_games.pop(game_id)
+        session.players.append(RemotePlayer("B", connection))
+        connection.game = session
+        self._start_game(session)
+
+    def _drop_waiting_games(self, connection: ClientConnection):
+        for game_id, (_, owner) in list(self._waiting_games.items()):
+            if owner is connection:
+                del self._waiting_games[game_id]
+                del self.games[game_id]
+
+    def _start_game(self, session: GameSession):
+        task = asyncio.get_running_loop().create_task(session.run())
+        self._game_tasks.add(task)
+        task.add_done_callback(self._game_tasks.discard)
+        task.add_done_callback(lambda _: self.games.pop(session.game_id, None))
+
+
+class LocalClient:
+    # Stand-in remote player which draws random lines, used to drive and test the server
+    def __init__(self, seed: Optional[int] = None):
+        self.rng: random.Random = random.Random(seed)
+        self.player_name: Optional[str] = None
+        self.messages: list[str] = []
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._available_edges: set[int] = set()
+        self._geometry = None
+
+    async def connect(self, host: str, port: int):
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+
+    async def send(self, message: str):
+        self._writer.write(message.encode("utf-8") + b"\n")
+        await self._writer.drain()
+
+    async def receive(self) -> str:
+        content = await self._reader.readline()
+        if len(content) == 0:
+            raise ConnectionError("Server closed the connection!")
+        message = content.decode("utf-8").strip()
+        self.messages.append(message)
+        return message
+
+    async def play(self) -> list[str]:
+        while True:
+            message = await self.receive()
+            command, _, argument = message.partition(" ")
+            if command == "START":
+                _, self.player_name, size, _ = argument.split()
+                rows, columns = size.split(",")
+                self._geometry = get_geometry(int(rows), int(columns))
+                self._available_edges = set(range(self._geometry.edge_count))
+            elif command == "TURN":
+                edge = self.rng.choice(sorted(self._available_edges))
+                await self.send(format_line(self._geometry.edge_line(edge)))
+            elif command == "MOVE":
+                line = parse_line(argument.partition(" ")[2])
+                self._available_edges.discard(self._geometry.edge_of(line))
+            elif command in ("END", "ABORT"):
+                return argument.split()
+
+    async def close(self):
+        if self._writer is not None:
+            await self.send("QUIT")
+            self._writer.close()
+            await self._writer.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dox game server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-games", type=int, default=4096)
+    parser.add_argument("--max-edges", type=int, default=MAX_BOARD_EDGES, help="Most lines a created board may have")
+    parser.add_argument("--workers", type=int, default=4, help="Threads computing computer player moves")
+    parser.add_argument("--round-deadline", type=float, default=None, help="Seconds players get per simultaneous round")
+    parser.add_argument("--timeout-policy", default=TimeoutPolicy.RANDOM_MOVE.value, choices=[p.value for p in TimeoutPolicy])
+    args = parser.parse_args()
+    server = GameServer(args.host, args.port, args.max_games, args.workers, args.round_deadline, TimeoutPolicy(args.timeout_policy),
+                        args.max_edges)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import functools
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+import game_ui
+from game_core import Board, BoardListener, Player, TurnBasedBoard, SimultaneousBoard
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+class LatencyStats:
+    def __init__(self):
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+        self.buckets: list[int] = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "total": self.total, "average": self.average, "max": self.max,
+                "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS], self.buckets))}
+
+
+class GameStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: dict[str, int] = {}
+        self.sections: dict[str, float] = {}
+        # (player type, board size) -> in_turn latency
+        self.moves: dict[tuple[str, str], LatencyStats] = {}
+
+    def reset(self):
+        with self._lock:
+            self.calls = {}
+            self.sections = {}
+            self.moves = {}
+
+    def count_call(self, name: str):
+        # Move collector threads count calls concurrently
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def add_section_time(self, section: str, seconds: float):
+        with self._lock:
+            self.sections[section] = self.sections.get(section, 0.0) + seconds
+
+    def add_move_latency(self, player_type: str, board_size: str, seconds: float):
+        with self._lock:
+            self.moves.setdefault((player_type, board_size), LatencyStats()).add(seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "sections": dict(self.sections),
+            "moves": [dict(stats.to_dict(), player=player, board=board) for (player, board), stats in self.moves.items()],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        lines = ["# TYPE dox_calls_total counter"]
+        for name, count in sorted(self.calls.items()):
+            lines.append(f'dox_calls_total{{function="{name}"}} {count}')
+        lines.append("# TYPE dox_section_seconds_total counter")
+        for section, seconds in sorted(self.sections.items()):
+            lines.append(f'dox_section_seconds_total{{section="{section}"}} {seconds:.9f}')
+        lines.append("# TYPE dox_move_latency_seconds histogram")
+        for (player, board), stats in sorted(self.moves.items()):
+            labels = f'player="{player}",board="{board}"'
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                lines.append(f'dox_move_latency_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'dox_move_latency_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+            lines.append(f'dox_move_latency_seconds_sum{{{labels}}} {stats.total:.9f}')
+            lines.append(f'dox_move_latency_seconds_count{{{labels}}} {stats.count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+
+class Instrumentation:
+    # Counting and timing wrappers are only installed while enabled, so a
+    # disabled instrumentation leaves the original methods untouched
+    def __init__(self, stats: GameStats):
+        self.stats: GameStats = stats
+        self._patches: list[tuple[object, str, Callable]] = []
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return len(self._patches) > 0
+
+    def _patch(self, owner: object, name: str, wrapper_factory: Callable[[Callable], Callable]):
+        original = owner.__dict__[name]
+        self._patches.append((owner, name, original))
+        setattr(owner, name, functools.wraps(original)(wrapper_factory(original)))
+
+    def _counter(self, name: str) -> Callable[[Callable], Callable]:
+        stats = self.stats
+
+        def factory(original: Callable) -> Callable:
+            def wrapper(*args, **kwargs):
+                stats.count_call(name)
+                return original(*args, **kwargs)
+
+            return wrapper
+
+        return factory
+
+    def _timer(self, section: str) -> Callable[[Callable], Callable]:
+        # Sections are exclusive: a renderer drawing from a listener inside draw_line pauses the
+        # engine section, so engine time is only the board's own work
+        stats, local = self.stats, self._local
+
+        def factory(original: Callable) -> Callable:
+            def wrapper(*args, **kwargs):
+                outer = getattr(local, "section", None)
+                if outer == section:
+                    return original(*args, **kwargs)
+                start_time = time.perf_counter()
+                if outer is not None:
+                    stats.add_section_time(outer, start_time - local.start_time)
+                local.section, local.start_time = section, start_time
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    end_time = time.perf_counter()
+                    stats.add_section_time(section, end_time - local.start_time)
+                    local.section, local.start_time = outer, end_time
+
+            return wrapper
+
+        return factory
+
+    def _move_timer(self) -> Callable[[Callable], Callable]:
+        stats, local = self.stats, self._local
+
+        def factory(original: Callable) -> Callable:
+            def wrapper(player: Player, *args, **kwargs):
+                # Subclasses calling super().in_turn() only count as one move
+                depth = getattr(local, "in_turn", 0)
+                local.in_turn = depth + 1
+                start_time = time.perf_counter()
+                try:
+                    return original(player, *args, **kwargs)
+                finally:
+                    local.in_turn = depth
+                    if depth == 0:
+                        board = player.get_game_board()
+                        stats.add_move_latency(player.player_type, f"{board.max_row}x{board.max_col}", time.perf_counter() - start_time)
+
+            return wrapper
+
+        return factory
+
+    @staticmethod
+    def _subclasses(base: type) -> list[type]:
+        result, pending = [], [base]
+        while len(pending) > 0:
+            cls = pending.pop()
+            result.append(cls)
+            pending.extend(cls.__subclasses__())
+        return result
+
+    def enable(self):
+        if self.enabled:
+            return
+        for name in ("has_line", "check_line", "_make_available_new_boxes", "get_adjacent_box_sides", "get_available_lines"):
+            self._patch(Board, name, self._counter(name))
+        for owner, name in ((TurnBasedBoard, "draw_line"), (SimultaneousBoard, "draw_line_players")):
+            self._patch(owner, name, self._counter(name))
+            self._patch(owner, name, self._timer("engine"))
+        self._patch(game_ui, "print_board", self._timer("render"))
+        for cls in self._subclasses(game_ui.BoardRenderer):
+            if "show_panel" in cls.__dict__:
+                self._patch(cls, "show_panel", self._timer("render"))
+        # Renderers drawing on every move count as rendering, other listeners on their own
+        for cls in self._subclasses(BoardListener):
+            section = "render" if issubclass(cls, game_ui.BoardRenderer) else "listeners"
+            for name in ("on_line_added", "on_line_removed", "on_reset"):
+                if name in cls.__dict__:
+                    self._patch(cls, name, self._timer(section))
+        for cls in self._subclasses(Player):
+            if "in_turn" in cls.__dict__ and not getattr(cls.__dict__["in_turn"], "__isabstractmethod__", False):
+                self._patch(cls, "in_turn", self._move_timer())
+
+    def disable(self):
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches = []
+
+
+stats: GameStats = GameStats()
+instrumentation: Instrumentation = Instrumentation(stats)
+
+
+def enable_instrumentation(reset: bool = True) -> GameStats:
+    if reset:
+        stats.reset()
+    instrumentation.enable()
+    return stats
+
+
+def disable_instrumentation() -> GameStats:
+    instrumentation.disable()
+    return stats
+
+
+def get_stats() -> Optional[GameStats]:
+    return stats if instrumentation.enabled else None
@@ -0,0 +1,102 @@
+import functools
+
+from game_engine import BoardGeometry, get_geometry
+
+
+class BoardSymmetry:
+    # Reflections of the dot grid, plus rotations and transposes on square boards
+    def __init__(self, geometry: BoardGeometry):
+        self.geometry: BoardGeometry = geometry
+        self.permutations: list[tuple[int, ...]] = [self._make_permutation(t) for t in self._point_transforms()]
+        self._chunk_count: int = (geometry.edge_count + 7) // 8
+        self.inverses: list[tuple[int, ...]] = [self._invert(p) for p in self.permutations]
+        self._tables: list[list[list[int]]] = [self._make_tables(p) for p in self.permutations]
+
+    @property
+    def size(self) -> int:
+        return len(self.permutations)
+
+    def _point_transforms(self) -> list:
+        last_row, last_col = self.geometry.max_row - 1, self.geometry.max_col - 1
+        transforms = [
+            lambda x, y: (x, y),
+            lambda x, y: (last_row - x, y),
+            lambda x, y: (x, last_col - y),
+            lambda x, y: (last_row - x, last_col - y),
+        ]
+        if self.geometry.max_row == self.geometry.max_col:
+            transforms += [
+                lambda x, y: (y, x),
+                lambda x, y: (last_col - y, x),
+                lambda x, y: (y, last_row - x),
+                lambda x, y: (last_col - y, last_row - x),
+            ]
+        return transforms
+
+    def _make_permutation(self, transform) -> tuple[int, ...]:
+        result = []
+        for edge in range(self.geometry.edge_count):
+            x1, y1, x2, y2 = self.geometry.edge_points(edge)
+            (x1, y1), (x2, y2) = sorted([transform(x1, y1), transform(x2, y2)])
+            if x1 == x2:
+                result.append(self.geometry.horizontal_edge(x1, y1))
+            else:
+                result.append(self.geometry.vertical_edge(x1, y1))
+        return tuple(result)
+
+    @staticmethod
+    def _invert(permutation: tuple[int, ...]) -> tuple[int, ...]:
+        result = [0] * len(permutation)
+        for edge, image in enumerate(permutation):
+            result[image] = edge
+        return tuple(result)
+
+    def _make_tables(self, permutation: tuple[int, ...]) -> list[list[int]]:
+        # One 256-entry table per byte of the mask, so a permutation costs a lookup per byte
+        tables = []
+        for chunk in range(self._chunk_count):
+            table = []
+            for byte in range(256):
+                value = 0
+                for bit in range(8):
+                    edge = chunk * 8 + bit
+                    if byte >> bit & 1 and edge < self.geometry.edge_count:
+                        value |= 1 << permutation[edge]
+                table.append(value)
+            tables.append(table)
+        return tables
+
+    def apply(self, mask: int, index: int) -> int:
+        result = 0
+        for table in self._tables[index]:
+            result |= table[mask & 0xFF]
+            mask >>= 8
+        return result
+
+    def images(self, mask: int) -> list[int]:
+        return [self.apply(mask, i) for i in range(len(self._tables))]
+
+    def canonical(self, mask: int) -> int:
+        # The largest image is the representative, so any position with more
+        # edges maps to a representative above the original mask
+        return max(self.images(mask))
+
+    def canonical_index(self, mask: int) -> tuple[int, int]:
+        # Also returns which permutation maps the mask onto its representative
+        best, best_index = -1, 0
+        for i in range(len(self._tables)):
+            image = self.apply(mask, i)
+            if image > best:
+                best, best_index = image, i
+        return best, best_index
+
+    def is_canonical(self, mask: int) -> bool:
+        for i in range(1, len(self._tables)):
+            if self.apply(mask, i) > mask:
+                return False
+        return True
+
+
+@functools.lru_cache(maxsize=32)
+def get_symmetry(max_row: int, max_col: int) -> BoardSymmetry:
+    return BoardSymmetry(get_geometry(max_row, max_col))
@@ -0,0 +1,156 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+from array import array
+from typing import Optional
+
+from game_engine import get_geometry
+from game_symmetry import get_symmetry
+
+_MAGIC = b"DOXT"
+_VERSION = 2
+# magic, version, rows, columns, edge count, canonical positions
+_HEADER = struct.Struct("<4sBBBxII")
+# The pure Python solver visits all 2^edges masks. 4x4 (24 edges) took 2.5 minutes on one
+# machine and over 12 on a slower one, 4x5 (31 edges) would take 128 times as long, so
+# larger boards aren't supported
+_MAX_EDGES = 24
+# Canonical positions before every block of the bitmap, to rank a mask with one popcount
+_BLOCK_BITS = 512
+_BLOCK_BYTES = _BLOCK_BITS // 8
+
+
+def tablebase_file_name(size: tuple[int, int]) -> str:
+    return f"{size[0]}x{size[1]}.dxt"
+
+
+def _to_signed(value: int) -> int:
+    return value - 256 if value > 127 else value
+
+
+def solve_tablebase(size: tuple[int, int], path: str, progress: bool = False):
+    # Value of a position = boxes the player to move wins minus boxes the
+    # opponent wins from here on, it only depends on the drawn edges
+    geometry = get_geometry(size[0], size[1])
+    symmetry = get_symmetry(size[0], size[1])
+    if geometry.edge_count > _MAX_EDGES:
+        raise ValueError(f"Board {size[0]}x{size[1]} has too many edges for a tablebase!")
+    full_mask = (1 << geometry.edge_count) - 1
+    box_masks = geometry.box_masks
+    edge_boxes = geometry.edge_boxes
+    bits = [(1 << e, e) for e in range(geometry.edge_count)]
+    values = bytearray(1 << geometry.edge_count)
+    # File layout: header, one bit per mask marking the canonical ones, the rank directory of the bitmap
+    # and the values of the canonical positions in ascending order
+    bitmap = bytearray(max(1, (1 << geometry.edge_count) // 8))
+    canonical_masks = array("I")
+    start_time = time.perf_counter()
+    # Children always have larger masks and canonical representatives, so a
+    # single descending pass sees every child before its parent
+    for mask in range(full_mask - 1, -1, -1):
+        if not symmetry.is_canonical(mask):
+            continue
+        best = -128
+        for bit, edge in bits:
+            if mask & bit:
+                continue
+            child = mask | bit
+            completed = 0
+            for box in edge_boxes[edge]:
+                if child & box_masks[box] == box_masks[box]:
+                    completed += 1
+            child_value = _to_signed(values[symmetry.canonical(child)])
+            value = completed + child_value if completed > 0 else -child_value
+            if value > best:
+                best = value
+        values[mask] = best & 0xFF
+        bitmap[mask >> 3] |= 1 << (mask & 7)
+        canonical_masks.append(mask)
+        if progress and mask & 0xFFFFF == 0:
+            print(f"{full_mask - mask}/{full_mask} positions, {time.perf_counter() - start_time:.1f}s")
+    # The full position has no move left, its value 0 is implied by the table
+    bitmap[full_mask >> 3] |= 1 << (full_mask & 7)
+    canonical_masks.insert(0, full_mask)
+    canonical_masks.reverse()
+    directory = array("I")
+    ranked = 0
+    for start in range(0, len(bitmap), _BLOCK_BYTES):
+        directory.append(ranked)
+        ranked += int.from_bytes(bitmap[start:start + _BLOCK_BYTES], "little").bit_count()
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, size[0], size[1], geometry.edge_count, len(canonical_masks)))
+        f.write(bitmap)
+        f.write(directory.tobytes())
+        f.write(bytes([values[m] for m in canonical_masks]))
+
+
+class Tablebase:
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._map: mmap.mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, cols, edge_count, position_count = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError(f"{path} isn't a tablebase file!")
+        self.size: tuple[int, int] = (rows, cols)
+        self.geometry = get_geometry(rows, cols)
+        bitmap_size = max(1, (1 << edge_count) // 8)
+        block_count = (bitmap_size + _BLOCK_BYTES - 1) // _BLOCK_BYTES
+        self._bitmap_offset: int = _HEADER.size
+        self._values_offset: int = self._bitmap_offset + bitmap_size + 4 * block_count
+        if edge_count != self.geometry.edge_count or len(self._map) != self._values_offset + position_count:
+            self.close()
+            raise ValueError(f"Tablebase {path} is broken!")
+        self._directory: array = array("I", self._map[self._bitmap_offset + bitmap_size:self._values_offset])
+        self._symmetry = get_symmetry(rows, cols)
+
+    @staticmethod
+    def open_for(size: tuple[int, int], directory: str) -> Optional['Tablebase']:
+        path = os.path.join(directory, tablebase_file_name(size))
+        return Tablebase(path) if os.path.exists(path) else None
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _rank(self, canonical: int) -> int:
+        block, offset = divmod(canonical, _BLOCK_BITS)
+        start = self._bitmap_offset + block * _BLOCK_BYTES
+        bits = int.from_bytes(self._map[start:start + _BLOCK_BYTES], "little") & ((1 << offset) - 1)
+        return self._directory[block] + bits.bit_count()
+
+    def value(self, mask: int) -> int:
+        return _to_signed(self._map[self._values_offset + self._rank(self._symmetry.canonical(mask))])
+
+    def move_values(self, mask: int) -> dict[int, int]:
+        result = {}
+        for edge in range(self.geometry.edge_count):
+            if mask >> edge & 1:
+                continue
+            child = mask | (1 << edge)
+            completed = sum([1 for b in self.geometry.edge_boxes[edge]
+                             if child & self.geometry.box_masks[b] == self.geometry.box_masks[b]])
+            child_value = self.value(child)
+            result[edge] = completed + child_value if completed > 0 else -child_value
+        return result
+
+    def best_edges(self, mask: int) -> list[int]:
+        move_values = self.move_values(mask)
+        best = max(move_values.values())
+        return [e for e, v in move_values.items() if v == best]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve every position of a small Dox board")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("columns", type=int)
+    parser.add_argument("--output", default=None, help="Tablebase file, default '<rows>x<columns>.dxt'")
+    args = parser.parse_args()
+    size = (args.rows, args.columns)
+    solve_tablebase(size, args.output or tablebase_file_name(size), progress=True)
+
+
+if __name__ == '__main__':
+    main()
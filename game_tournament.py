@@ -0,0 +1,218 @@
+import hashlib
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, Optional
+
+from game_core import Player
+from game_runner import ConflictStalemate, play_headless_game
+from game_utils import GameType, EngineType
+
+_DEFAULT_RATING = 1500.0
+_ELO_K_FACTOR = 16.0
+
+
+class GameSpec:
+    def __init__(self, index: int, player_classes: tuple[type[Player], type[Player]], size: tuple[int, int], game_type: GameType, seed: int):
+        self.index: int = index
+        self.player_classes: tuple[type[Player], type[Player]] = player_classes
+        self.size: tuple[int, int] = size
+        self.game_type: GameType = game_type
+        self.seed: int = seed
+
+    @property
+    def participants(self) -> tuple[str, str]:
+        return self.player_classes[0].__name__, self.player_classes[1].__name__
+
+    def __repr__(self) -> str:
+        return f"GameSpec({self.index} {' vs '.join(self.participants)} {self.size[0]}x{self.size[1]} {self.game_type.value} seed={self.seed})"
+
+
+class GameOutcome:
+    def __init__(self, spec: GameSpec, scores: tuple[float, float], duration: float, aborted: bool = False):
+        self.index: int = spec.index
+        self.participants: tuple[str, str] = spec.participants
+        self.size: tuple[int, int] = spec.size
+        self.game_type: GameType = spec.game_type
+        self.seed: int = spec.seed
+        self.scores: tuple[float, float] = scores
+        self.duration: float = duration
+        # Deterministic players may conflict in every simultaneous round, such games have no result
+        self.aborted: bool = aborted
+
+    @property
+    def result(self) -> float:
+        # Score of the first participant: 1 win, 0.5 tie, 0 loss
+        if abs(self.scores[0] - self.scores[1]) < 0.01:
+            return 0.5
+        return 1.0 if self.scores[0] > self.scores[1] else 0.0
+
+    @property
+    def margin(self) -> float:
+        return self.scores[0] - self.scores[1]
+
+
+def derive_game_seed(seed: int, index: int) -> int:
+    digest = hashlib.blake2b(f"{seed}:{index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFFFFFF
+
+
+def _play_batch(specs: list[GameSpec], engine_type: EngineType) -> list[GameOutcome]:
+    outcomes = []
+    for spec in specs:
+        start_time = time.perf_counter()
+        try:
+            result = play_headless_game(spec.size, spec.game_type, list(spec.player_classes), spec.seed, engine_type)
+        except ConflictStalemate:
+            outcomes.append(GameOutcome(spec, (0.0, 0.0), time.perf_counter() - start_time, aborted=True))
+            continue
+        outcomes.append(GameOutcome(spec, (result.scores[0], result.scores[1]), result.duration))
+    return outcomes
+
+
+class ParticipantStats:
+    def __init__(self, name: str):
+        self.name: str = name
+        self.games: int = 0
+        self.wins: int = 0
+        self.ties: int = 0
+        self.losses: int = 0
+        self.total_margin: float = 0.0
+        self.rating: float = _DEFAULT_RATING
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games > 0 else 0.0
+
+    @property
+    def average_margin(self) -> float:
+        return self.total_margin / self.games if self.games > 0 else 0.0
+
+    def add(self, result: float, margin: float):
+        self.games += 1
+        self.total_margin += margin
+        if result == 1.0:
+            self.wins += 1
+        elif result == 0.0:
+            self.losses += 1
+        else:
+            self.ties += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "games": self.games,
+            "wins": self.wins,
+            "ties": self.ties,
+            "losses": self.losses,
+            "win_rate": self.win_rate,
+            "average_margin": self.average_margin,
+            "rating": self.rating,
+        }
+
+    def __repr__(self) -> str:
+        return f"{self.name}: {self.wins}/{self.ties}/{self.losses} win rate {self.win_rate:.3f} margin {self.average_margin:+.2f} Elo {self.rating:.0f}"
+
+
+class TournamentStats:
+    def __init__(self):
+        self.outcomes: list[GameOutcome] = []
+        self.aborted: list[GameOutcome] = []
+        self.participants: dict[str, ParticipantStats] = {}
+        self.groups: dict[tuple[str, tuple[int, int], GameType], ParticipantStats] = {}
+
+    def add(self, outcome: GameOutcome):
+        if outcome.aborted:
+            self.aborted.append(outcome)
+            return
+        self.outcomes.append(outcome)
+        for i, name in enumerate(outcome.participants):
+            result = outcome.result if i == 0 else 1.0 - outcome.result
+            margin = outcome.margin if i == 0 else -outcome.margin
+            self.participants.setdefault(name, ParticipantStats(name)).add(result, margin)
+            self.groups.setdefault((name, outcome.size, outcome.game_type), ParticipantStats(name)).add(result, margin)
+
+    def extend(self, outcomes: list[GameOutcome]):
+        for outcome in outcomes:
+            self.add(outcome)
+
+    def _update_ratings(self):
+        # Replay games in schedule order so ratings don't depend on batch arrival order
+        ratings = {name: _DEFAULT_RATING for name in self.participants}
+        for outcome in sorted(self.outcomes, key=lambda x: x.index):
+            name_a, name_b = outcome.participants
+            expected_a = 1.0 / (1.0 + 10 ** ((ratings[name_b] - ratings[name_a]) / 400.0))
+            delta = _ELO_K_FACTOR * (outcome.result - expected_a)
+            ratings[name_a] += delta
+            ratings[name_b] -= delta
+        for name, stats in self.participants.items():
+            stats.rating = ratings[name]
+
+    def ranking(self) -> list[ParticipantStats]:
+        self._update_ratings()
+        return sorted(self.participants.values(), key=lambda x: x.rating, reverse=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "games": len(self.outcomes),
+            "aborted": [{"index": o.index, "participants": list(o.participants), "size": list(o.size),
+                         "game_type": o.game_type.value, "seed": o.seed} for o in self.aborted],
+            "participants": [p.to_dict() for p in self.ranking()],
+            "groups": [
+                dict(stats.to_dict(), size=list(size), game_type=game_type.value)
+                for (_, size, game_type), stats in sorted(self.groups.items(), key=lambda x: (x[0][0], x[0][1], x[0][2].value))
+            ],
+        }
+
+
+class Tournament:
+    def __init__(self, player_classes: list[type[Player]], board_sizes: list[tuple[int, int]],
+                 game_types: Optional[list[GameType]] = None, games_per_pairing: int = 10, seed: int = 0,
+                 workers: Optional[int] = None, batch_size: int = 16, engine_type: EngineType = EngineType.BITBOARD):
+        if len(player_classes) < 2:
+            raise ValueError("Tournament needs at least 2 player classes!")
+        if len(set(player_classes)) != len(player_classes):
+            raise ValueError("Same player classes exists!")
+        self.player_classes: list[type[Player]] = player_classes
+        self.board_sizes: list[tuple[int, int]] = board_sizes
+        # Simultaneous games between deterministic players mostly conflict, ask for them explicitly
+        self.game_types: list[GameType] = game_types if game_types is not None else [GameType.TURN_BASED]
+        self.games_per_pairing: int = games_per_pairing
+        self.seed: int = seed
+        self.workers: int = workers if workers is not None else (os.cpu_count() or 1)
+        self.batch_size: int = batch_size
+        self.engine_type: EngineType = engine_type
+
+    def schedule(self) -> list[GameSpec]:
+        specs = []
+        for pairing in itertools.combinations(self.player_classes, 2):
+            for size in self.board_sizes:
+                for game_type in self.game_types:
+                    for game in range(self.games_per_pairing):
+                        # Alternate seats so neither side always sits first
+                        classes = pairing if game % 2 == 0 else (pairing[1], pairing[0])
+                        index = len(specs)
+                        specs.append(GameSpec(index, classes, size, game_type, derive_game_seed(self.seed, index)))
+        return specs
+
+    def _batches(self) -> list[list[GameSpec]]:
+        specs = self.schedule()
+        return [specs[i:i + self.batch_size] for i in range(0, len(specs), self.batch_size)]
+
+    def run_batches(self) -> Iterator[list[GameOutcome]]:
+        batches = self._batches()
+        if self.workers <= 1:
+            for batch in batches:
+                yield _play_batch(batch, self.engine_type)
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(_play_batch, batch, self.engine_type) for batch in batches]
+                for future in as_completed(futures):
+                    yield future.result()
+
+    def run(self) -> TournamentStats:
+        stats = TournamentStats()
+        for outcomes in self.run_batches():
+            stats.extend(outcomes)
+        return stats
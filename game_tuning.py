@@ -0,0 +1,203 @@
+import argparse
+import functools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from game_evaluator import DEFAULT_SIDE_WEIGHTS, check_side_weights, save_weight_profile
+from game_players import SmartComputerPlayer
+from game_runner import play_headless_game
+from game_tournament import derive_game_seed
+from game_utils import GameType
+
+# (size, weights of the first seat, weights of the second seat, seed)
+MatchJob = tuple[tuple[int, int], tuple, tuple, int]
+_CHECKPOINT_VERSION = 1
+
+
+def _play_matches(jobs: list[MatchJob]) -> list[float]:
+    # Result of the first seat: 1 win, 0.5 tie, 0 loss
+    results = []
+    for size, weights_a, weights_b, seed in jobs:
+        factories = [functools.partial(SmartComputerPlayer, side_weights=weights_a),
+                     functools.partial(SmartComputerPlayer, side_weights=weights_b)]
+        # Simultaneous rounds between equal heuristics mostly conflict, self-play uses turns
+        result = play_headless_game(size, GameType.TURN_BASED, factories, seed)
+        if result.scores[0] == result.scores[1]:
+            results.append(0.5)
+        else:
+            results.append(1.0 if result.scores[0] > result.scores[1] else 0.0)
+    return results
+
+
+class SpsaTuner:
+    # Simultaneous perturbation stochastic approximation: each iteration plays the weights moved
+    # by +c and -c along one random sign vector against each other, and steps along the match result.
+    # The heuristic only compares scores, so weights are rescaled to keep the largest one at 3.
+    def __init__(self, sizes: list[tuple[int, int]], games_per_iteration: int = 64, seed: int = 0,
+                 workers: Optional[int] = None, batch_size: int = 8, step_size: float = 1.0, perturbation: float = 0.5,
+                 stability: float = 10.0, evaluation_games: int = 128, evaluate_every: int = 10,
+                 initial_weights: tuple = DEFAULT_SIDE_WEIGHTS):
+        if len(sizes) == 0:
+            raise ValueError("Tuning needs at least 1 board size!")
+        self.sizes: list[tuple[int, int]] = sizes
+        self.games_per_iteration: int = games_per_iteration
+        self.seed: int = seed
+        self.workers: int = workers if workers is not None else (os.cpu_count() or 1)
+        self.batch_size: int = batch_size
+        self.step_size: float = step_size
+        self.perturbation: float = perturbation
+        self.stability: float = stability
+        self.evaluation_games: int = evaluation_games
+        self.evaluate_every: int = evaluate_every
+        self.iteration: int = 0
+        self.weights: list[float] = [float(w) for w in check_side_weights(initial_weights)]
+        self.best_weights: list[float] = list(self.weights)
+        # Score against the default weights, 0.5 means as strong
+        self.best_score: float = 0.5
+        self.history: list[dict] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._game_index: int = 0
+
+    def _normalize(self, weights: list[float]) -> list[float]:
+        scale = max(abs(w) for w in weights)
+        return list(weights) if scale == 0 else [w * 3.0 / scale for w in weights]
+
+    def _play(self, weights_a: list[float], weights_b: list[float], games: int) -> float:
+        # Mean result of weights_a, seats alternate and every size gets the same share of games
+        jobs = []
+        for game in range(games):
+            size = self.sizes[game % len(self.sizes)]
+            seed = derive_game_seed(self.seed, self._game_index)
+            self._game_index += 1
+            if game % 2 == 0:
+                jobs.append((size, tuple(weights_a), tuple(weights_b), seed))
+            else:
+                jobs.append((size, tuple(weights_b), tuple(weights_a), seed))
+        batches = [jobs[i:i + self.batch_size] for i in range(0, len(jobs), self.batch_size)]
+        if self.workers <= 1:
+            batch_results = [_play_matches(batch) for batch in batches]
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            batch_results = list(self._executor.map(_play_matches, batches))
+        results = [r for batch in batch_results for r in batch]
+        return sum(r if i % 2 == 0 else 1.0 - r for i, r in enumerate(results)) / len(results)
+
+    def step(self) -> dict:
+        k = self.iteration
+        step_size = self.step_size / (k + 1 + self.stability) ** 0.602
+        perturbation = self.perturbation / (k + 1) ** 0.101
+        # Derived from the iteration, so a resumed run perturbs the same way
+        rng = random.Random(derive_game_seed(self.seed, -1 - k))
+        signs = [rng.choice((-1.0, 1.0)) for _ in self.weights]
+        plus = [w + perturbation * s for w, s in zip(self.weights, signs)]
+        minus = [w - perturbation * s for w, s in zip(self.weights, signs)]
+        result = self._play(plus, minus, self.games_per_iteration)
+        # Scores around 0.5 mean no difference, the gradient is along the signs
+        gradient = (2.0 * result - 1.0) / (2.0 * perturbation)
+        self.weights = self._normalize([w + step_size * gradient * s for w, s in zip(self.weights, signs)])
+        self.iteration += 1
+        record = {"iteration": self.iteration, "result": result, "weights": list(self.weights)}
+        if self.evaluate_every > 0 and self.iteration % self.evaluate_every == 0:
+            score = self._play(self.weights, list(DEFAULT_SIDE_WEIGHTS), self.evaluation_games)
+            record["score"] = score
+            if score > self.best_score:
+                self.best_score, self.best_weights = score, list(self.weights)
+        self.history.append(record)
+        return record
+
+    def run(self, iterations: int, checkpoint_path: Optional[str] = None, progress: bool = False):
+        try:
+            while self.iteration < iterations:
+                start_time = time.perf_counter()
+                record = self.step()
+                if checkpoint_path is not None:
+                    self.save_checkpoint(checkpoint_path)
+                if progress:
+                    score = f" vs default {record['score']:.3f}" if "score" in record else ""
+                    weights = ", ".join([f"{w:+.3f}" for w in record["weights"]])
+                    print(f"Iteration {self.iteration}: result {record['result']:.3f}{score} weights ({weights}) "
+                          f"in {time.perf_counter() - start_time:.2f}s")
+        finally:
+            self.close()
+
+    def to_dict(self) -> dict:
+        return {
+            "version": _CHECKPOINT_VERSION,
+            "sizes": [list(size) for size in self.sizes],
+            "seed": self.seed,
+            "iteration": self.iteration,
+            "game_index": self._game_index,
+            "weights": self.weights,
+            "best_weights": self.best_weights,
+            "best_score": self.best_score,
+            "history": self.history,
+        }
+
+    def save_checkpoint(self, path: str):
+        # Replace atomically so an interrupted write never loses the previous checkpoint
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(temp_path, path)
+
+    def load_checkpoint(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            content = json.load(f)
+        if content.get("version") != _CHECKPOINT_VERSION:
+            raise ValueError(f"{path} isn't a tuning checkpoint!")
+        if [tuple(size) for size in content["sizes"]] != self.sizes or content["seed"] != self.seed:
+            raise ValueError(f"{path} was tuned with other sizes or seed!")
+        self.iteration = content["iteration"]
+        self._game_index = content["game_index"]
+        self.weights = content["weights"]
+        self.best_weights = content["best_weights"]
+        self.best_score = content["best_score"]
+        self.history = content["history"]
+
+    def export_profile(self, path: str):
+        save_weight_profile(path, tuple(self.best_weights), score=self.best_score, iterations=self.iteration,
+                            sizes=[list(size) for size in self.sizes])
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _parse_size(content: str) -> tuple[int, int]:
+    try:
+        rows, columns = content.lower().split("x")
+        return int(rows), int(columns)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Size {content} should look like 5x5!")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the smart player's side weights by self-play")
+    parser.add_argument("--sizes", type=_parse_size, nargs="+", default=[(5, 5), (6, 6)])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--games", type=int, default=64, help="Self-play games per iteration")
+    parser.add_argument("--evaluation-games", type=int, default=128, help="Games against the default weights per evaluation")
+    parser.add_argument("--evaluate-every", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint", default="smart_tuning.json", help="Resumed from when it exists")
+    parser.add_argument("--output", default="smart_profile.json", help="Best weights, load with --smart-profile, only the smart player uses them")
+    args = parser.parse_args()
+    tuner = SpsaTuner(args.sizes, args.games, args.seed, args.workers, evaluation_games=args.evaluation_games,
+                      evaluate_every=args.evaluate_every)
+    if os.path.exists(args.checkpoint):
+        tuner.load_checkpoint(args.checkpoint)
+        print(f"Resume from iteration {tuner.iteration}")
+    tuner.run(args.iterations, args.checkpoint, progress=True)
+    tuner.export_profile(args.output)
+    print(f"Best weights {tuner.best_weights} scored {tuner.best_score:.3f} against the defaults")
+
+
+if __name__ == '__main__':
+    main()
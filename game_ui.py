@@ -1,28 +1,45 @@
 import re
+import shutil
+import sys
+from typing import Optional
 
-from game_core import Board, Player
-from game_utils import Line, PlayerType, GameType
+from game_core import Board, BoardListener, Player
+from game_utils import Line, Box, PlayerType, GameType, GameCommand, GameCommandRequest, RenderMode
 
 _LINE_1_REGEX = re.compile(r"^\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)\s*$")
 _LINE_2_REGEX = re.compile(r"^\s*(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s*$")
 _SIZE_REGEX = re.compile(r"^\s*(\d+)\s*,\s*(\d+)\s*$")
+_COMMANDS = {"u": GameCommand.UNDO, "undo": GameCommand.UNDO, "r": GameCommand.REDO, "redo": GameCommand.REDO}
+_VIEW_REGEX = re.compile(r"^\s*v(?:iew)?\s+(\d+)\s+(\d+)\s*$", re.IGNORECASE)
+
+
+def parse_line(content: str) -> Line:
+    pattern = _LINE_1_REGEX.fullmatch(content)
+    if pattern is None:
+        pattern = _LINE_2_REGEX.fullmatch(content)
+    if pattern is None:
+        raise ValueError("Wrong input format!")
+    px1, py1, px2, py2 = pattern.groups()
+    return Line((int(px1) - 1, int(py1) - 1), (int(px2) - 1, int(py2) - 1))
+
+
+def format_line(line: Line) -> str:
+    return f"{line.point_1.x + 1} {line.point_1.y + 1} {line.point_2.x + 1} {line.point_2.y + 1}"
 
 
 def input_line(player: Player) -> Line:
-    print(f"Entre the pairs to connect for {player}. Format: '(x1,y1)(x2,y2)' or 'x1 y1 x2 y2'")
+    print(f"Entre the pairs to connect for {player}. Format: '(x1,y1)(x2,y2)' or 'x1 y1 x2 y2', 'u' to undo, 'r' to redo, 'v x y' to view around a point")
     while True:
         content = input("Input: ").strip()
-        pattern = _LINE_1_REGEX.fullmatch(content)
-        if pattern is None:
-            pattern = _LINE_2_REGEX.fullmatch(content)
-        if pattern is not None:
-            px1, py1, px2, py2 = pattern.groups()
-            try:
-                return Line((int(px1) - 1, int(py1) - 1), (int(px2) - 1, int(py2) - 1))
-            except ValueError as e:
-                print(e)
-        else:
-            print("Wrong input format!")
+        if content.lower() in _COMMANDS:
+            raise GameCommandRequest(_COMMANDS[content.lower()])
+        view_pattern = _VIEW_REGEX.fullmatch(content)
+        if view_pattern is not None:
+            raise GameCommandRequest(GameCommand.VIEW, (int(view_pattern.group(1)) - 1, int(view_pattern.group(2)) - 1))
+        try:
+            return parse_line(content)
+        except ValueError as e:
+            print(e)
 
 
 def input_board_size() -> tuple[int, int]:
@@ -46,6 +63,7 @@ def input_player_type() -> PlayerType:
     print("1 -> Human players")
     print("2 -> Human player and Random Computer player")
     print("3 -> Human player and Smart Computer player")
+    print("4 -> Human player and Search Computer player")
     while True:
         content = input("Input: ").strip()
         try:
@@ -56,6 +74,8 @@ def input_player_type() -> PlayerType:
                 return PlayerType.HUMAN_AND_RANDOM_COMPUTER
             elif choice == 3:
                 return PlayerType.HUMAN_AND_SMART_COMPUTER
+            elif choice == 4:
+                return PlayerType.HUMAN_AND_SEARCH_COMPUTER
             else:
                 print(f"Unknown choice {choice}")
         except ValueError:
@@ -105,52 +125,213 @@ def print_player_link(player: Player, line: Line):
     print(f"{player} draw line {line}")
 
 
+def render_board(board: Board) -> str:
+    geometry = board.geometry
+    buffer = ["  x\n", "y   " + "   ".join([str(i + 1) for i in range(board.max_col)]) + "\n"]
+    for px in range(board.max_row):
+        buffer.append(f"  {px + 1} ")
+        for py in range(board.max_col - 1):
+            buffer.append("*---" if board.has_edge(geometry.horizontal_edge(px, py)) else "*   ")
+        buffer.append("*\n")
+        if px == board.max_row - 1:
+            break
+        buffer.append("    ")
+        for py in range(board.max_col):
+            buffer.append("| " if board.has_edge(geometry.vertical_edge(px, py)) else "  ")
+            if py == board.max_col - 1:
+                break
+            box_player = board.find_box_players(px, py)
+            if box_player is None:
+                buffer.append("  ")
+            elif len(box_player[1]) == 1:
+                buffer.append(f"{box_player[1][0].player_name} ")
+            else:
+                buffer.append("@ ")
+        buffer.append("\n")
+    return "".join(buffer)
+
+
+def render_board_window(board: Board, top: int, left: int, rows: int, columns: int) -> str:
+    geometry = board.geometry
+    bottom, right = min(board.max_row, top + rows), min(board.max_col, left + columns)
+    width = len(str(board.max_row))
+    buffer = ["  x\n", "y".ljust(width + 3) + "".join([str(i + 1).ljust(4) for i in range(left, right)]).rstrip() + "\n"]
+    for px in range(top, bottom):
+        buffer.append(f"{px + 1:>{width + 2}} ")
+        for py in range(left, right - 1):
+            buffer.append("*---" if board.has_edge(geometry.horizontal_edge(px, py)) else "*   ")
+        buffer.append("*\n")
+        if px == bottom - 1:
+            break
+        buffer.append(" " * (width + 3))
+        for py in range(left, right):
+            buffer.append("| " if board.has_edge(geometry.vertical_edge(px, py)) else "  ")
+            if py == right - 1:
+                break
+            box_player = board.find_box_players(px, py)
+            if box_player is None:
+                buffer.append("  ")
+            elif len(box_player[1]) == 1:
+                buffer.append(f"{box_player[1][0].player_name} ")
+            else:
+                buffer.append("@ ")
+        buffer.append("\n")
+    return "".join(buffer)
+
+
 def print_board(board: Board):
-    print("  x")
-    for r in range(board.max_row * 2):
-        if r == 0:
-            print("y   " + "   ".join([str(i + 1) for i in range(board.max_col)]), end='')
-        elif r % 2 == 0:
-            print("  ", end='')
-            px1 = r // 2 - 1
-            px2 = px1 + 1
-            for c in range(board.max_col * 2):
-                if c == 0:
-                    print("  ", end='')
-                elif c % 2 == 0:
-                    py = c // 2 - 1
-                    box_player = board.find_box_players(px1, py)
-                    if box_player is None:
-                        print("  ", end='')
-                    elif len(box_player[1]) == 1:
-                        print(f"{box_player[1][0].player_name} ", end='')
-                    else:
-                        print(f"@ ", end='')
-                else:
-                    py = c // 2
-                    if board.has_points_line((px1, py), (px2, py)):
-                        print("| ", end='')
-                    else:
-                        print("  ", end='')
-        else:
-            print("  ", end='')
-            px = r // 2
-            for c in range(board.max_col * 2):
-                if c == 0:
-                    print(f"{px + 1} ", end='')
-                elif c % 2 == 0:
-                    py1 = c // 2 - 1
-                    py2 = py1 + 1
-                    if board.has_points_line((px, py1), (px, py2)):
-                        print("---", end='')
-                    else:
-                        print("   ", end='')
-                else:
-                    print("*", end='')
-        print()
+    sys.stdout.write(render_board(board))
+    sys.stdout.flush()
 
 
 def print_game_panel(board: Board):
     print_board(board)
     print()
     print_scores(board)
+
+
+class BoardRenderer(BoardListener):
+    def open(self, board: Board):
+        pass
+
+    def show_panel(self, board: Board):
+        print_game_panel(board)
+
+    def center(self, x: int, y: int):
+        pass
+
+    def close(self):
+        pass
+
+
+class IncrementalRenderer(BoardRenderer):
+    # The board stays at the top of the terminal and only changed cells are rewritten,
+    # everything else is printed into a scroll region below it
+    def __init__(self):
+        self.board: Optional[Board] = None
+        self._scores_row: int = 0
+
+    @staticmethod
+    def fits(board: Board) -> bool:
+        terminal = shutil.get_terminal_size()
+        return 2 * board.max_row + 8 <= terminal.lines and 4 * board.max_col + 6 <= terminal.columns
+
+    def open(self, board: Board):
+        self.board = board
+        self._scores_row = 2 * board.max_row + 3
+        board.add_listener(self)
+        self._redraw()
+
+    def _redraw(self):
+        board = self.board
+        scroll_top = self._scores_row + 2
+        sys.stdout.write(f"\x1b[r\x1b[2J\x1b[H{render_board(board)}\n{self._render_scores()}\n"
+                         f"\x1b[{scroll_top};{shutil.get_terminal_size().lines}r\x1b[{scroll_top};1H")
+        sys.stdout.flush()
+
+    def _render_scores(self) -> str:
+        return "Scores: " + ", ".join([f"{p.player_name}: {p.score:.1f}" for p in self.board.players]) + "\x1b[K"
+
+    def _edge_cell(self, edge: int) -> tuple[int, int, str]:
+        x1, y1, x2, y2 = self.board.geometry.edge_points(edge)
+        if x1 == x2:
+            return 2 * x1 + 3, len(str(x1 + 1)) + 4 * y1 + 5, "---"
+        else:
+            return 2 * x1 + 4, 4 * y1 + 5, "|"
+
+    @staticmethod
+    def _box_cell(box: Box) -> tuple[int, int]:
+        return 2 * box.x + 4, 4 * box.y + 7
+
+    def _write_cells(self, cells: list[tuple[int, int, str]]):
+        buffer = ["\x1b7"]
+        for row, column, content in cells:
+            buffer.append(f"\x1b[{row};{column}H{content}")
+        buffer.append(f"\x1b[{self._scores_row};1H{self._render_scores()}\x1b8")
+        sys.stdout.write("".join(buffer))
+        sys.stdout.flush()
+
+    def on_line_added(self, board: Board, edge: int, players: list[Player], new_boxes: dict[Box, list[Player]]):
+        cells = [self._edge_cell(edge)]
+        for box, box_players in new_boxes.items():
+            cells.append((*self._box_cell(box), box_players[0].player_name if len(box_players) == 1 else "@"))
+        self._write_cells(cells)
+
+    def on_line_removed(self, board: Board, edge: int, players: list[Player], removed_boxes: list[Box]):
+        row, column, content = self._edge_cell(edge)
+        cells = [(row, column, " " * len(content))]
+        for box in removed_boxes:
+            cells.append((*self._box_cell(box), " "))
+        self._write_cells(cells)
+
+    def on_reset(self, board: Board):
+        self._redraw()
+
+    def show_panel(self, board: Board):
+        pass
+
+    def close(self):
+        if self.board is not None:
+            self.board.remove_listener(self)
+            self.board = None
+            sys.stdout.write(f"\x1b[r\x1b[{shutil.get_terminal_size().lines};1H\n")
+            sys.stdout.flush()
+
+
+class ViewportRenderer(BoardRenderer):
+    # Only a terminal sized window of the board is printed, following the latest move unless moved by hand
+    def __init__(self):
+        self.board: Optional[Board] = None
+        self.focus: tuple[int, int] = (0, 0)
+
+    def open(self, board: Board):
+        self.board = board
+        self.focus = (board.max_row // 2, board.max_col // 2)
+        board.add_listener(self)
+
+    def center(self, x: int, y: int):
+        self.focus = (x, y)
+
+    def on_line_added(self, board: Board, edge: int, players: list[Player], new_boxes: dict[Box, list[Player]]):
+        self.focus = board.geometry.edge_points(edge)[:2]
+
+    def on_line_removed(self, board: Board, edge: int, players: list[Player], removed_boxes: list[Box]):
+        self.focus = board.geometry.edge_points(edge)[:2]
+
+    def window(self, board: Board) -> tuple[int, int, int, int]:
+        terminal = shutil.get_terminal_size()
+        rows = min(board.max_row, max(4, (terminal.lines - 10) // 2))
+        columns = min(board.max_col, max(4, (terminal.columns - len(str(board.max_row)) - 4) // 4))
+        top = min(max(0, self.focus[0] - rows // 2), board.max_row - rows)
+        left = min(max(0, self.focus[1] - columns // 2), board.max_col - columns)
+        return top, left, rows, columns
+
+    def show_panel(self, board: Board):
+        top, left, rows, columns = self.window(board)
+        sys.stdout.write(render_board_window(board, top, left, rows, columns))
+        sys.stdout.write(f"Rows {top + 1}-{top + rows}, columns {left + 1}-{left + columns} of {board.max_row}x{board.max_col}\n")
+        sys.stdout.flush()
+        print()
+        print_scores(board)
+
+    def close(self):
+        if self.board is not None:
+            self.board.remove_listener(self)
+            self.board = None
+
+
+def create_renderer(mode: RenderMode, board: Board) -> BoardRenderer:
+    if mode == RenderMode.FULL:
+        if board.geometry.is_huge:
+            print("Board is too large to print, fall back to viewport rendering")
+            return ViewportRenderer()
+        return BoardRenderer()
+    elif mode == RenderMode.INCREMENTAL:
+        if IncrementalRenderer.fits(board):
+            return IncrementalRenderer()
+        print("Board doesn't fit in the terminal, fall back to viewport rendering")
+        return ViewportRenderer()
+    elif mode == RenderMode.VIEWPORT:
+        return ViewportRenderer()
+    else:
+        raise SystemError(f"Unhandled render mode {mode}!")
@@ -1,5 +1,5 @@
 import enum
-from typing import Union
+from typing import Optional, Union
 from itertools import chain
 
 
@@ -7,6 +7,7 @@ class PlayerType(str, enum.Enum):
     HUMANS = "HUMANS"
     HUMAN_AND_RANDOM_COMPUTER = "HUMAN_AND_RANDOM_COMPUTER"
     HUMAN_AND_SMART_COMPUTER = "HUMAN_AND_SMART_COMPUTER"
+    HUMAN_AND_SEARCH_COMPUTER = "HUMAN_AND_SEARCH_COMPUTER"
 
 
 class GameType(str, enum.Enum):
@@ -14,11 +15,76 @@ class GameType(str, enum.Enum):
     SIMULTANEOUS = "SIMULTANEOUS"
 
 
+class EngineType(str, enum.Enum):
+    LINE_SET = "LINE_SET"
+    BITBOARD = "BITBOARD"
+    PACKED = "PACKED"
+
+
+class RolloutPolicy(str, enum.Enum):
+    RANDOM = "RANDOM"
+    HEURISTIC = "HEURISTIC"
+
+
+class RenderMode(str, enum.Enum):
+    FULL = "FULL"
+    INCREMENTAL = "INCREMENTAL"
+    VIEWPORT = "VIEWPORT"
+
+
+class TimeoutPolicy(str, enum.Enum):
+    RANDOM_MOVE = "RANDOM_MOVE"
+    SKIP_TURN = "SKIP_TURN"
+
+
+class BotType(str, enum.Enum):
+    RANDOM = "RANDOM"
+    SMART = "SMART"
+    CHAIN = "CHAIN"
+    ALPHA_BETA = "ALPHA_BETA"
+    MONTE_CARLO = "MONTE_CARLO"
+
+
+class GameCommand(str, enum.Enum):
+    UNDO = "UNDO"
+    REDO = "REDO"
+    VIEW = "VIEW"
+
+
+class GameCommandRequest(Exception):
+    def __init__(self, command: GameCommand, argument: Optional[tuple[int, int]] = None):
+        super().__init__(f"Command {command.value} requested")
+        self.command: GameCommand = command
+        self.argument: Optional[tuple[int, int]] = argument
+
+
+# Interning stops past this many instances per class, so huge boards don't keep every line alive
+MAX_INTERNED = 1 << 16
+
+
 class Point:
     # x -> row  y -> col
-    def __init__(self, x: int, y: int):
-        self.x: int = x
-        self.y: int = y
+    # Points are immutable and interned, so each coordinate pair maps to one shared instance
+    __slots__ = ("x", "y", "_hash")
+    _instances: dict[tuple[int, int], 'Point'] = {}
+
+    def __new__(cls, x: int, y: int):
+        instances = cls._instances
+        point = instances.get((x, y))
+        if point is None:
+            point = object.__new__(cls)
+            object.__setattr__(point, "x", x)
+            object.__setattr__(point, "y", y)
+            object.__setattr__(point, "_hash", hash((x, y)))
+            if len(instances) < MAX_INTERNED:
+                instances[(x, y)] = point
+        return point
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable!")
+
+    def __reduce__(self):
+        return self.__class__, (self.x, self.y)
 
     def in_range(self, left: int, top: int, right: int, bottom: int) -> bool:
         return top <= self.x <= bottom and left <= self.y <= right
@@ -27,9 +93,11 @@ class Point:
         return Point(self.x + offset_x, self.y + offset_y)
 
     def __hash__(self):
-        return hash((self.x, self.y))
+        return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, type(self)):
             return NotImplemented
         return self.x == other.x and self.y == other.y
@@ -42,25 +110,44 @@ class Point:
 
 
 class Line:
-    def __init__(self, p1: Union[Point, tuple[int, int]], p2: Union[Point, tuple[int, int]]):
-        if isinstance(p1, tuple):
-            p1 = Point(p1[0], p1[1])
-        if isinstance(p2, tuple):
-            p2 = Point(p2[0], p2[1])
-        if p1 == p2:
-            raise ValueError(f"Points {p1} and {p2} can't make a line!")
-        if p1.x + p1.y < p2.x + p2.y:
-            self._p1: Point = p1
-            self._p2: Point = p2
-        else:
-            self._p1: Point = p2
-            self._p2: Point = p1
+    # Lines are immutable and interned by their normalized end points
+    __slots__ = ("_p1", "_p2", "_hash")
+    _instances: dict[tuple[int, int, int, int], 'Line'] = {}
+
+    def __new__(cls, p1: Union[Point, tuple[int, int]], p2: Union[Point, tuple[int, int]]):
+        x1, y1 = (p1[0], p1[1]) if isinstance(p1, tuple) else (p1.x, p1.y)
+        x2, y2 = (p2[0], p2[1]) if isinstance(p2, tuple) else (p2.x, p2.y)
+        return cls.of(x1, y1, x2, y2)
+
+    @classmethod
+    def of(cls, x1: int, y1: int, x2: int, y2: int) -> 'Line':
+        if x1 + y1 >= x2 + y2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        key = (x1, y1, x2, y2)
+        line = cls._instances.get(key)
+        if line is None:
+            if x1 == x2 and y1 == y2:
+                raise ValueError(f"Points {Point(x1, y1)} and {Point(x2, y2)} can't make a line!")
+            line = object.__new__(cls)
+            p1, p2 = Point(x1, y1), Point(x2, y2)
+            object.__setattr__(line, "_p1", p1)
+            object.__setattr__(line, "_p2", p2)
+            object.__setattr__(line, "_hash", hash((p1, p2)))
+            if len(cls._instances) < MAX_INTERNED:
+                cls._instances[key] = line
+        return line
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable!")
+
+    def __reduce__(self):
+        return self.__class__, (self._p1, self._p2)
 
     def in_range(self, left: int, top: int, right: int, bottom: int) -> bool:
         return self._p1.in_range(left, top, right, bottom) and self._p2.in_range(left, top, right, bottom)
 
     def offset(self, offset_x: int = 0, offset_y: int = 0) -> 'Line':
-        return Line(self._p1.offset(offset_x, offset_y), self._p2.offset(offset_x, offset_y))
+        return Line.of(self._p1.x + offset_x, self._p1.y + offset_y, self._p2.x + offset_x, self._p2.y + offset_y)
 
     @property
     def point_1(self):
@@ -83,9 +170,11 @@ class Line:
         return self._p1.x == self._p2.x and self._p1.y != self._p2.y
 
     def __hash__(self):
-        return hash((self._p1, self._p2))
+        return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, type(self)):
             return NotImplemented
         return self.point_1 == other.point_1 and self.point_2 == other.point_2
@@ -98,6 +187,8 @@ class Line:
 
 
 class Box(Point):
+    __slots__ = ()
+    _instances: dict[tuple[int, int], 'Box'] = {}
 
     @staticmethod
     def from_points(points: list[Point]) -> 'Box':
@@ -1,8 +1,43 @@
+import argparse
+
+from game_evaluator import DEFAULT_SIDE_WEIGHTS, load_weight_profile
 from game_manager import play_game
+from game_protocol import run_engine
+from game_stats import enable_instrumentation, disable_instrumentation
+from game_utils import TimeoutPolicy, RenderMode
 
 
 def main():
-    play_game()
+    parser = argparse.ArgumentParser(description="Dox game")
+    parser.add_argument("--stats", default=None, help="Record move latency and hot-path counters into a JSON or '.prom' file")
+    parser.add_argument("--record", default=None, help="Append every move to a binary game record file")
+    parser.add_argument("--round-deadline", type=float, default=None, help="Seconds computer players get per simultaneous round")
+    parser.add_argument("--timeout-policy", default=TimeoutPolicy.RANDOM_MOVE.value, choices=[p.value for p in TimeoutPolicy])
+    parser.add_argument("--render", default=RenderMode.FULL.value, choices=[m.value for m in RenderMode],
+                        help="INCREMENTAL keeps the board on screen and only redraws changed cells, VIEWPORT prints a window around the latest move")
+    parser.add_argument("--smart-profile", default=None, help="Side weights of the smart computer player, exported by game_tuning.py, the other players keep the default weights")
+    parser.add_argument("--move-time", type=float, default=None, help="Seconds the search computer player may think per move, default 1 without --game-time")
+    parser.add_argument("--game-time", type=float, default=None, help="Seconds the search computer player may think in the whole game")
+    parser.add_argument("--no-ponder", action="store_true", help="Don't let the search computer player think during your turn")
+    parser.add_argument("--engine", action="store_true", help="Speak the line based engine protocol on stdin/stdout instead of prompting")
+    parser.add_argument("--engine-workers", type=int, default=2, help="Worker processes computing bot moves in engine mode")
+    args = parser.parse_args()
+    if args.engine:
+        run_engine(args.engine_workers)
+        return
+    move_time = 1.0 if args.move_time is None and args.game_time is None else args.move_time
+    smart_weights = DEFAULT_SIDE_WEIGHTS if args.smart_profile is None else load_weight_profile(args.smart_profile)
+    game_args = (args.record, args.round_deadline, TimeoutPolicy(args.timeout_policy), RenderMode(args.render), smart_weights,
+                 move_time, args.game_time, not args.no_ponder)
+    if args.stats is None:
+        play_game(*game_args)
+    else:
+        stats = enable_instrumentation()
+        try:
+            play_game(*game_args)
+        finally:
+            disable_instrumentation()
+            stats.export(args.stats)
 
 
 if __name__ == '__main__':